@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_test_settings():
+    """Те же настройки, что у manage.py test (core/test_runner.py)."""
+    from core.test_runner import isolated_settings
+
+    with isolated_settings():
+        yield
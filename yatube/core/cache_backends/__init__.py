@@ -0,0 +1,6 @@
+"""Общие для всех процессов бэкенды кеша.
+
+sqlite.SQLiteCache — файл на локальном диске, без внешних зависимостей.
+resp.RespCache — любой сервер с протоколом Redis (RESP);
+resp_server.RespServer — минимальный такой сервер для тестов и разработки.
+"""
@@ -0,0 +1,225 @@
+"""Клиент кеша для серверов с протоколом Redis (RESP2).
+
+Нужна только стандартная библиотека: подходит Redis, Valkey, KeyDB
+или resp_server.RespServer в тестах. LOCATION — redis://host:port/db.
+"""
+import os
+import pickle
+import socket
+import threading
+from urllib.parse import urlsplit
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+DEFAULT_PORT = 6379
+
+
+class RespError(Exception):
+    """Сервер ответил ошибкой (строка «-ERR ...»)."""
+
+
+def pack_command(*args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = b'%d' % arg
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError('Соединение с сервером кеша закрыто')
+    kind, payload = line[:1], line[1:-2]
+    if kind == b'+':
+        return payload.decode()
+    if kind == b'-':
+        return RespError(payload.decode())
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        length = int(payload)
+        if length < 0:
+            return None
+        return [read_reply(stream) for _ in range(length)]
+    raise ConnectionError('Неизвестный ответ сервера кеша: %r' % line)
+
+
+def _encode(value):
+    # Целые храним строкой, чтобы работал серверный INCRBY.
+    if type(value) is int:
+        return b'%d' % value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(data):
+    # pickle со второго протокола начинается с байта 0x80.
+    if data[:1] == b'\x80':
+        return pickle.loads(data)
+    return int(data)
+
+
+class RespConnection:
+    def __init__(self, host, port, db, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile('rb')
+        if db:
+            self.execute('SELECT', db)
+
+    def pipeline(self, commands):
+        """Отправляет команды одним пакетом и читает все ответы."""
+        self.sock.sendall(b''.join(pack_command(*args) for args in commands))
+        replies = [read_reply(self.stream) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+
+class RespCache(BaseCache):
+    """Одно постоянное соединение на поток; set_many уходит пакетом."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        url = urlsplit(location if '//' in location else f'//{location}')
+        self.host = url.hostname or '127.0.0.1'
+        self.port = url.port or DEFAULT_PORT
+        self.db = int(url.path.strip('/') or 0)
+        options = params.get('OPTIONS', {})
+        self.socket_timeout = options.get('SOCKET_TIMEOUT', 5)
+        self._local = threading.local()
+
+    @property
+    def _client(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = RespConnection(
+                self.host, self.port, self.db, self.socket_timeout,
+            )
+            local.pid = os.getpid()
+        return local.connection
+
+    def _pipeline(self, commands):
+        try:
+            return self._client.pipeline(commands)
+        except OSError:
+            # Оборванное соединение откроется заново при следующем вызове.
+            self._disconnect()
+            raise
+
+    def _execute(self, *args):
+        return self._pipeline([args])[0]
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _ttl_ms(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return int(timeout * 1000)
+
+    def _set_command(self, key, value, ttl, *flags):
+        command = ['SET', key, _encode(value), *flags]
+        if ttl is not None:
+            command += ['PX', ttl]
+        return command
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key, ttl = self._key(key, version), self._ttl_ms(timeout)
+        if ttl is not None and ttl <= 0:
+            return not self._execute('EXISTS', key)
+        return self._execute(*self._set_command(key, value, ttl, 'NX')) == 'OK'
+
+    def get(self, key, default=None, version=None):
+        data = self._execute('GET', self._key(key, version))
+        return default if data is None else _decode(data)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        values = self._execute('MGET', *keys)
+        return {
+            key: _decode(data)
+            for key, data in zip(keys.values(), values) if data is not None
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        keys = [self._key(key, version) for key in data]
+        if not keys:
+            return []
+        ttl = self._ttl_ms(timeout)
+        if ttl is not None and ttl <= 0:
+            self._execute('DEL', *keys)
+        else:
+            self._pipeline([
+                self._set_command(key, value, ttl)
+                for key, value in zip(keys, data.values())
+            ])
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key, ttl = self._key(key, version), self._ttl_ms(timeout)
+        if ttl is None:
+            # PERSIST отвечает 0 и для ключа без срока — проверяем EXISTS.
+            return bool(self._pipeline([('PERSIST', key), ('EXISTS', key)])[1])
+        if ttl <= 0:
+            return bool(self._execute('DEL', key))
+        return bool(self._execute('PEXPIRE', key, ttl))
+
+    def delete(self, key, version=None):
+        self._execute('DEL', self._key(key, version))
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._execute('DEL', *keys)
+
+    def has_key(self, key, version=None):
+        return bool(self._execute('EXISTS', self._key(key, version)))
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        data = self._execute('GET', key)
+        if data is None:
+            raise ValueError("Key '%s' not found" % key)
+        value = _decode(data)
+        if type(value) is int:
+            return self._execute('INCRBY', key, delta)
+        # Не целое значение складываем на клиенте, как LocMemCache.
+        value += delta
+        self._execute('SET', key, _encode(value), 'KEEPTTL')
+        return value
+
+    def clear(self):
+        self._execute('FLUSHDB')
+
+    def _disconnect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+        self._local.__dict__.clear()
@@ -0,0 +1,218 @@
+"""Минимальный сервер с протоколом Redis для тестов и разработки.
+
+Поддерживает только команды, которые нужны RespCache. Данные живут
+в памяти процесса, поэтому для продакшена нужен настоящий Redis.
+
+    python -m core.cache_backends.resp_server --port 6379
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+from .resp import RespError, read_reply
+
+OK = 'OK'
+
+
+def _encode_reply(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, RespError):
+        return b'-%s\r\n' % str(reply).encode()
+    if isinstance(reply, str):
+        return b'+%s\r\n' % reply.encode()
+    if isinstance(reply, bool):
+        reply = int(reply)
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, bytes):
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+    return b'*%d\r\n' % len(reply) + b''.join(map(_encode_reply, reply))
+
+
+class Storage:
+    """Базы SELECT 0..N: ключ -> (значение, момент истечения или None)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.databases = {}
+
+    def db(self, index):
+        return self.databases.setdefault(index, {})
+
+    @staticmethod
+    def lookup(db, key):
+        item = db.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.time():
+            del db[key]
+            return None
+        return item
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.db_index = 0
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except (ConnectionError, ValueError):
+                return
+            if not isinstance(command, list) or not command:
+                return
+            name = command[0].decode().upper()
+            args = command[1:]
+            if name == 'QUIT':
+                self.wfile.write(_encode_reply(OK))
+                return
+            method = getattr(self, f'cmd_{name.lower()}', None)
+            if method is None:
+                reply = RespError(f"ERR unknown command '{name}'")
+            else:
+                storage = self.server.storage
+                with storage.lock:
+                    try:
+                        reply = method(storage.db(self.db_index), *args)
+                    except (TypeError, ValueError):
+                        reply = RespError(
+                            f"ERR wrong arguments for '{name}' command"
+                        )
+            self.wfile.write(_encode_reply(reply))
+
+    def _get(self, db, key):
+        item = Storage.lookup(db, key)
+        return None if item is None else item[0]
+
+    def cmd_ping(self, db):
+        return 'PONG'
+
+    def cmd_select(self, db, index):
+        self.db_index = int(index)
+        return OK
+
+    def cmd_get(self, db, key):
+        return self._get(db, key)
+
+    def cmd_mget(self, db, *keys):
+        return [self._get(db, key) for key in keys]
+
+    def cmd_set(self, db, key, value, *options):
+        options = [option.decode().upper() for option in options]
+        item = Storage.lookup(db, key)
+        if 'NX' in options and item is not None:
+            return None
+        if 'XX' in options and item is None:
+            return None
+        expires = None
+        if 'KEEPTTL' in options and item is not None:
+            expires = item[1]
+        for unit, scale in (('EX', 1), ('PX', 1000)):
+            if unit in options:
+                ttl = int(options[options.index(unit) + 1])
+                if ttl <= 0:
+                    return RespError('ERR invalid expire time in set')
+                expires = time.time() + ttl / scale
+        db[key] = (value, expires)
+        return OK
+
+    def cmd_del(self, db, *keys):
+        return sum(
+            Storage.lookup(db, key) is not None and db.pop(key) is not None
+            for key in keys
+        )
+
+    def cmd_exists(self, db, *keys):
+        return sum(Storage.lookup(db, key) is not None for key in keys)
+
+    def cmd_incrby(self, db, key, delta):
+        item = Storage.lookup(db, key)
+        value, expires = (b'0', None) if item is None else item
+        try:
+            value = int(value) + int(delta)
+        except ValueError:
+            return RespError('ERR value is not an integer or out of range')
+        db[key] = (b'%d' % value, expires)
+        return value
+
+    def cmd_incr(self, db, key):
+        return self.cmd_incrby(db, key, b'1')
+
+    def cmd_pexpire(self, db, key, ttl):
+        item = Storage.lookup(db, key)
+        if item is None:
+            return 0
+        if int(ttl) <= 0:
+            del db[key]
+        else:
+            db[key] = (item[0], time.time() + int(ttl) / 1000)
+        return 1
+
+    def cmd_expire(self, db, key, ttl):
+        return self.cmd_pexpire(db, key, int(ttl) * 1000)
+
+    def cmd_persist(self, db, key):
+        item = Storage.lookup(db, key)
+        if item is None or item[1] is None:
+            return 0
+        db[key] = (item[0], None)
+        return 1
+
+    def cmd_pttl(self, db, key):
+        item = Storage.lookup(db, key)
+        if item is None:
+            return -2
+        if item[1] is None:
+            return -1
+        return int((item[1] - time.time()) * 1000)
+
+    def cmd_dbsize(self, db):
+        return sum(Storage.lookup(db, key) is not None for key in list(db))
+
+    def cmd_flushdb(self, db):
+        db.clear()
+        return OK
+
+    def cmd_flushall(self, db):
+        self.server.storage.databases.clear()
+        return OK
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, RespHandler)
+        self.storage = Storage()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'redis://{host}:{port}/0'
+
+    def start(self):
+        """Запускает сервер в фоновом потоке (для тестов)."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    options = parser.parse_args()
+    server = RespServer((options.host, options.port))
+    print(f'Listening on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Бэкенд SQLite с настройкой соединения для продакшена (ENGINE 'core.db')."""
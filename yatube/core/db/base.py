@@ -0,0 +1,44 @@
+"""SQLite-бэкенд Django с PRAGMA при открытии соединения.
+
+Дополнительные ключи OPTIONS (в sqlite3.connect не передаются):
+
+* pragmas — словарь PRAGMA, выполняются по порядку для каждого нового
+  соединения: journal_mode, synchronous, mmap_size, cache_size,
+  busy_timeout и т. п.;
+* transaction_mode — как начинать transaction.atomic(): DEFERRED
+  (по умолчанию в Django), IMMEDIATE или EXCLUSIVE.
+
+С IMMEDIATE транзакция сразу берёт блокировку записи и при занятой
+базе ждёт busy_timeout. В режиме DEFERRED она начинается как читающая,
+и если другой писатель успел закоммитить, повышение до записи сразу
+падает с «database is locked» — ожидание тут не помогает.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        mode = params.pop('transaction_mode', None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode должен быть одним из {TRANSACTION_MODES}',
+            )
+        self.transaction_mode = mode and mode.upper()
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
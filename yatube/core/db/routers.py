@@ -0,0 +1,80 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в settings.DATABASE_REPLICAS. Их копирует
+manage.py sync_replicas, поэтому они отстают от основной базы.
+Чтобы пользователь сразу видел свои изменения, запрос, который
+что-то записал, закрепляет его за основной базой на
+DATABASE_REPLICA_PIN_SECONDS секунд (см. ReplicaPinningMiddleware).
+
+Вне HTTP-запроса (команды, shell, тесты) всё читается
+из основной базы.
+"""
+import random
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def begin_routing(pinned=False):
+    """Включает чтение с реплик для текущего запроса; вернёт токен."""
+    return _state.set(RoutingState(pinned))
+
+
+def end_routing(token):
+    """Завершает запрос; вернёт его RoutingState."""
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+class use_primary(ContextDecorator):
+    """Читать из основной базы до конца запроса.
+
+    Для представлений, которые пишут: объект для правки или подписки
+    читается без отставания реплики.
+    """
+
+    def __enter__(self):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = settings.DATABASE_REPLICAS
+        if state is None or state.pinned or not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # Дальше в этом запросе читаем только что записанное.
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же строки, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплики вместе с данными при синхронизации.
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,145 @@
+"""Счётчики стоимости запроса: SQL, шаблоны и кеш.
+
+collect_metrics() включает сбор для блока кода, RequestMetricsMiddleware —
+для HTTP-запроса. Вне активного сбора обёртки ничего не делают.
+"""
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.backends.django import Template
+
+_current = ContextVar('request_metrics', default=None)
+_MISSING = object()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.view_name = None
+        self.total_ms = 0.0
+        self.db_queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._template_depth = 0
+
+    def as_dict(self):
+        return {
+            'view': self.view_name,
+            'total_ms': round(self.total_ms, 2),
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_ms, 2),
+            'template_ms': round(self.template_ms, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing."""
+        return ', '.join([
+            f'db;dur={self.db_ms:.2f};desc="{self.db_queries} queries"',
+            f'tpl;dur={self.template_ms:.2f}',
+            f'cache;desc="hits={self.cache_hits} misses={self.cache_misses}"',
+            f'total;dur={self.total_ms:.2f}',
+        ])
+
+    def __str__(self):
+        return ' '.join(
+            f'{key}={value}' for key, value in self.as_dict().items()
+        )
+
+
+def current_metrics():
+    return _current.get()
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.db_queries += 1
+            metrics.db_ms += (time.perf_counter() - start) * 1000
+
+
+def _timed_render(render):
+    def wrapper(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None or metrics._template_depth:
+            return render(self, context, request)
+        # Вложенные render_to_string учитываются во внешнем рендере.
+        metrics._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            metrics._template_depth -= 1
+            metrics.template_ms += (time.perf_counter() - start) * 1000
+    wrapper.metrics_wrapped = True
+    return wrapper
+
+
+def _counted_cache(cache):
+    get, get_many = cache.get, cache.get_many
+
+    def counted_get(key, default=None, version=None):
+        value = get(key, _MISSING, version=version)
+        metrics = _current.get()
+        if metrics is not None:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def counted_get_many(keys, version=None):
+        keys = list(keys)
+        metrics = _current.get()
+        # BaseCache.get_many вызывает get() — не считаем ключи дважды.
+        token = _current.set(None)
+        try:
+            found = get_many(keys, version=version)
+        finally:
+            _current.reset(token)
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+
+    cache.get, cache.get_many = counted_get, counted_get_many
+    cache.metrics_wrapped = True
+
+
+def _instrument():
+    if not getattr(Template.render, 'metrics_wrapped', False):
+        Template.render = _timed_render(Template.render)
+    # Бэкенды кеша создаются по одному на поток — оборачиваем каждый.
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        if not getattr(cache, 'metrics_wrapped', False):
+            _counted_cache(cache)
+
+
+@contextmanager
+def collect_metrics():
+    """Собирает RequestMetrics для кода внутри блока with."""
+    _instrument()
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(_record_query),
+                )
+            yield metrics
+    finally:
+        metrics.total_ms = (time.perf_counter() - start) * 1000
+        _current.reset(token)
@@ -0,0 +1,80 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+
+from .db.routers import begin_routing, end_routing
+from .metrics import collect_metrics
+
+logger = logging.getLogger('yatube.metrics')
+
+
+class RequestMetricsMiddleware:
+    """Отдаёт стоимость запроса в Server-Timing и в лог.
+
+    Измеряется доля запросов REQUEST_METRICS_SAMPLE_RATE,
+    остальные проходят без накладных расходов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        with collect_metrics() as metrics:
+            response = self.get_response(request)
+            if request.resolver_match is not None:
+                metrics.view_name = request.resolver_match.view_name
+        response['Server-Timing'] = metrics.server_timing()
+        logger.info(
+            '%s %s status=%s %s',
+            request.method,
+            request.path,
+            response.status_code,
+            metrics,
+            extra={'metrics': metrics.as_dict()},
+        )
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """Закрепляет за основной базой того, кто только что записал.
+
+    Небезопасные методы (POST и т. п.) читают из основной базы целиком.
+    Если запрос что-то записал, в ответ ставится кука PIN_COOKIE со
+    временем окончания закрепления: пока она действует, чтение
+    не уходит на отстающие реплики. Стоит выше SessionMiddleware,
+    чтобы сохранение сессии тоже считалось записью.
+    """
+
+    PIN_COOKIE = 'db_pin'
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def is_pinned(self, request):
+        if request.method not in self.SAFE_METHODS:
+            return True
+        try:
+            return float(request.COOKIES[self.PIN_COOKIE]) > time.time()
+        except (KeyError, ValueError):
+            return False
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        token = begin_routing(pinned=self.is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            state = end_routing(token)
+        if state.wrote:
+            seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+            response.set_cookie(
+                self.PIN_COOKIE, f'{time.time() + seconds:.0f}',
+                max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
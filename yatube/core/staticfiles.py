@@ -0,0 +1,73 @@
+"""Статика с хешем содержимого в имени и сжатыми копиями.
+
+collectstatic пишет рядом с каждым style.<hash>.css копии .gz и,
+если установлен пакет brotli, .br. Такие файлы не меняются никогда,
+поэтому отдаются с Cache-Control: immutable (см. core/wsgi.py).
+"""
+import gzip
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = re.compile(
+    r'\.(css|js|map|json|svg|txt|xml|html|ico|eot|ttf|otf)$', re.I,
+)
+# Имя вида name.0123456789ab.ext, которое даёт ManifestStaticFilesStorage.
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+# Меньшая экономия не стоит лишнего файла и распаковки у клиента.
+MIN_RATIO = 0.95
+# Порядок — предпочтение при выборе по Accept-Encoding.
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def compress(data):
+    """{'gzip': …, 'br': …} — сжатые копии, заметно меньшие оригинала."""
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data)
+    return {
+        encoding: body for encoding, body in variants.items()
+        if len(body) < len(data) * MIN_RATIO
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Файла нет в STATIC_ROOT (collectstatic не запускали):
+            # страница не должна падать, ссылка остаётся без хеша.
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = []
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options,
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                names += [name, hashed_name]
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        # Сжимаем после всех проходов: ссылки внутри css уже заменены.
+        for name in dict.fromkeys(names):
+            if COMPRESSIBLE.search(name):
+                self._write_compressed(name)
+
+    def _write_compressed(self, name):
+        with self.open(name) as file_:
+            data = file_.read()
+        for encoding, body in compress(data).items():
+            compressed_name = name + ENCODING_SUFFIXES[encoding]
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(body))
@@ -0,0 +1,114 @@
+"""Общий для всех пользователей кеш фрагмента с «дырками».
+
+{% sharedcache %} работает как {% cache %}, но не зависит от
+пользователя: персональные куски внутри помечаются {% personal %},
+в кеш попадает только маркер, а сам кусок рендерится при каждом
+запросе и подставляется в готовый фрагмент.
+"""
+import base64
+import json
+import re
+
+from django import template
+from django.templatetags.cache import CacheNode
+from django.template.base import token_kwargs
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+# Текст постов экранируется автоэкранированием, поэтому подделать
+# маркер из пользовательского ввода нельзя: «<!--» превращается в «&lt;!--».
+HOLE_RE = re.compile(r'<!--hole:([A-Za-z0-9_-]+)-->')
+PUNCHING = 'hole_punching'
+
+
+def _encode(template_name, values):
+    raw = json.dumps([template_name, values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(token):
+    raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    return json.loads(raw.decode())
+
+
+def _render_personal(context, template_name, values):
+    personal = context.template.engine.get_template(template_name)
+    with context.push(**values):
+        return personal.render(context)
+
+
+def fill_holes(content, context):
+    return HOLE_RE.sub(
+        lambda match: _render_personal(context, *_decode(match.group(1))),
+        content,
+    )
+
+
+class SharedCacheNode(CacheNode):
+    def render(self, context):
+        with context.push(**{PUNCHING: True}):
+            content = super().render(context)
+        return mark_safe(fill_holes(content, context))
+
+
+class PersonalNode(template.Node):
+    def __init__(self, template_name, extra_context):
+        self.template_name = template_name
+        self.extra_context = extra_context
+
+    def render(self, context):
+        template_name = self.template_name.resolve(context)
+        values = {
+            name: value.resolve(context)
+            for name, value in self.extra_context.items()
+        }
+        if context.get(PUNCHING):
+            # Значения попадают в кеш, поэтому только простые типы.
+            return f'<!--hole:{_encode(template_name, values)}-->'
+        return _render_personal(context, template_name, values)
+
+
+@register.tag
+def sharedcache(parser, token):
+    """
+    Usage::
+
+        {% sharedcache [expire_time] [fragment_name] [var1] .. %}
+            ... {% personal 'template.html' key=value %} ...
+        {% endsharedcache %}
+    """
+    nodelist = parser.parse(('endsharedcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.',
+        )
+    return SharedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(bit) for bit in tokens[3:]],
+        None,
+    )
+
+
+@register.tag
+def personal(parser, token):
+    """
+    Usage::
+
+        {% personal 'template.html' [key=value ..] %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]!r} tag requires a template name.',
+        )
+    extra_context = token_kwargs(bits[2:], parser, support_legacy=False)
+    if len(bits) > 2 and not extra_context:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]!r} tag accepts only key=value arguments.',
+        )
+    return PersonalNode(parser.compile_filter(bits[1]), extra_context)
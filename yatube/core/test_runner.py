@@ -0,0 +1,49 @@
+"""Настройки на время тестов: свой кеш, без выборки метрик и фона.
+
+isolated_settings() включает их для всего прогона: TestRunner —
+в manage.py test, фикстура в conftest.py в корне — в pytest.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def isolated_settings():
+    """Временный файл кеша, REQUEST_METRICS_SAMPLE_RATE = 0, миниатюры сразу.
+
+    cache.clear() в тестах не стирает рабочий кеш, в лог не попадают
+    случайные строки метрик, а фоновый поток не пишет в базу, пока
+    тест её очищает.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube-test-cache-')
+    cache = dict(
+        settings.CACHE_BACKENDS['sqlite'],
+        LOCATION=os.path.join(directory, 'cache.sqlite3'),
+        KEY_PREFIX=settings.CACHES['default'].get('KEY_PREFIX', ''),
+    )
+    try:
+        with override_settings(
+            CACHES={'default': cache},
+            REQUEST_METRICS_SAMPLE_RATE=0.0,
+            POSTS_THUMBNAIL_EXECUTOR='sync',
+        ):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolation = ExitStack()
+        self._isolation.enter_context(isolated_settings())
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolation.close()
+        super().teardown_test_environment(**kwargs)
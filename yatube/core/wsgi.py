@@ -0,0 +1,116 @@
+"""Раздача собранной статики прямо из WSGI, когда перед Django нет nginx.
+
+Файлы STATIC_ROOT один раз обходятся при старте: на запрос — только
+поиск в словаре, выбор сжатой копии по Accept-Encoding и отдача файла
+через wsgi.file_wrapper. Остальные запросы уходят в Django.
+"""
+import mimetypes
+import os
+from wsgiref.headers import Headers
+
+from django.conf import settings
+from django.utils.http import http_date
+
+from .staticfiles import ENCODING_SUFFIXES, HASHED_NAME
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Имена без хеша могут смениться при следующем collectstatic.
+SHORT_LIVED = 'public, max-age=60'
+CHUNK_SIZE = 64 * 1024
+
+
+class StaticFile:
+    def __init__(self, path, url):
+        self.variants = {None: path}
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            if os.path.isfile(path + suffix):
+                self.variants[encoding] = path + suffix
+        stat = os.stat(path)
+        content_type, _ = mimetypes.guess_type(path)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in (
+            'application/javascript', 'application/json',
+        ):
+            content_type += '; charset=utf-8'
+        self.etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        self.headers = [
+            ('Content-Type', content_type),
+            ('Cache-Control', IMMUTABLE if HASHED_NAME.search(url)
+             else SHORT_LIVED),
+            ('Last-Modified', http_date(stat.st_mtime)),
+        ]
+        if len(self.variants) > 1:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+    def choose(self, accept_encoding):
+        """(кодировка, путь) лучшего варианта, который принимает клиент."""
+        accepted = set()
+        for item in accept_encoding.split(','):
+            coding, _, params = item.strip().partition(';')
+            if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00'):
+                accepted.add(coding.strip().lower())
+        for encoding in ENCODING_SUFFIXES:
+            if encoding in self.variants and (
+                encoding in accepted or '*' in accepted
+            ):
+                return encoding, self.variants[encoding]
+        return None, self.variants[None]
+
+
+class StaticFilesApplication:
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = root or settings.STATIC_ROOT
+        self.prefix = prefix or settings.STATIC_URL
+        self.files = self.scan()
+
+    def scan(self):
+        files = {}
+        if not self.root or not os.path.isdir(self.root):
+            return files
+        suffixes = tuple(ENCODING_SUFFIXES.values())
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                if name.endswith(suffixes) and os.path.isfile(
+                    path[:-len(os.path.splitext(name)[1])],
+                ):
+                    continue
+                relative = os.path.relpath(path, self.root)
+                url = self.prefix + relative.replace(os.sep, '/')
+                files[url] = StaticFile(path, url)
+        return files
+
+    def __call__(self, environ, start_response):
+        static_file = self.files.get(environ.get('PATH_INFO', ''))
+        method = environ['REQUEST_METHOD']
+        if static_file is None or method not in ('GET', 'HEAD'):
+            return self.application(environ, start_response)
+        encoding, path = static_file.choose(
+            environ.get('HTTP_ACCEPT_ENCODING', ''),
+        )
+        headers = Headers(list(static_file.headers))
+        # У каждой сжатой копии свой ETag: байты у них разные.
+        etag = static_file.etag
+        if encoding is not None:
+            etag = f'{etag[:-1]}-{encoding}"'
+            headers['Content-Encoding'] = encoding
+        headers['ETag'] = etag
+        if environ.get('HTTP_IF_NONE_MATCH') == etag:
+            del headers['Content-Encoding']
+            start_response('304 Not Modified', headers.items())
+            return []
+        headers['Content-Length'] = str(os.path.getsize(path))
+        start_response('200 OK', headers.items())
+        if method == 'HEAD':
+            return []
+        file_ = open(path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(file_, CHUNK_SIZE)
+        return read_chunks(file_)
+
+
+def read_chunks(file_):
+    with file_:
+        yield from iter(lambda: file_.read(CHUNK_SIZE), b'')
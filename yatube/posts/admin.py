@@ -1,6 +1,11 @@
+import datetime
+
 from django.contrib import admin
+from django.utils import timezone
 
-from .models import Group, Post
+from .models import Group, Post, PostQuerySet
+from .paginator import EstimatedCountPaginator
+from .search import filter_posts
 
 # Register your models here.
 # admin.site.register(Post)
@@ -11,6 +16,46 @@ class GroupAdmin(admin.ModelAdmin):
     pass
 
 
+def next_period(day, kind):
+    if kind == "year":
+        return datetime.date(day.year + 1, 1, 1)
+    if kind == "month":
+        return (day.replace(day=28) + datetime.timedelta(days=4)).replace(
+            day=1,
+        )
+    return day + datetime.timedelta(days=1)
+
+
+class ChangeListQuerySet(PostQuerySet):
+    def dates(self, field_name, kind, order="ASC"):
+        """Года, месяцы или дни с постами — прыжками по индексу.
+
+        Вместо SELECT DISTINCT по всем строкам — по одному
+        ORDER BY field LIMIT 1 на каждое значение, их немного.
+        """
+        values = self.order_by(field_name).values_list(
+            field_name, flat=True,
+        )
+        dates = []
+        current = values.first()
+        while current is not None:
+            if timezone.is_aware(current):
+                current = timezone.localtime(current)
+            day = current.date()
+            if kind == "year":
+                day = day.replace(month=1, day=1)
+            elif kind == "month":
+                day = day.replace(day=1)
+            dates.append(day)
+            start = datetime.datetime.combine(
+                next_period(day, kind), datetime.time.min,
+            )
+            if timezone.is_aware(current):
+                start = timezone.make_aware(start)
+            current = values.filter(**{f"{field_name}__gte": start}).first()
+        return dates[::-1] if order == "DESC" else dates
+
+
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = (
@@ -22,6 +67,34 @@ class PostAdmin(admin.ModelAdmin):
     )
 
     list_editable = ("group",)
+    list_select_related = ("author", "group")
     search_fields = ("text",)
     list_filter = ("pub_date",)
+    date_hierarchy = "pub_date"
     empty_value_display = "-пусто-"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = ChangeListQuerySet(
+            self.model, using=self.model._default_manager.db,
+        )
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == "group":
+            # Один список групп на все редактируемые строки страницы,
+            # а не запрос на каждую.
+            choices = getattr(request, "_group_choices", None)
+            if choices is None:
+                choices = request._group_choices = list(field.choices)
+            field.choices = choices
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%…%' по всей таблице — полнотекстовый индекс.
+        return filter_posts(queryset, search_term), False
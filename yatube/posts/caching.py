@@ -0,0 +1,85 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+COUNT_TIMEOUT: int = 60 * 60
+
+
+def count_key(scope):
+    return f'posts:count:{scope}'
+
+
+def post_count_scopes(post, group_ids=()):
+    """Области подсчёта, которые меняются вместе с постом."""
+    scopes = {'all', f'author:{post.author_id}'}
+    for group_id in (post.group_id, *group_ids):
+        if group_id is not None:
+            scopes.add(f'group:{group_id}')
+    return scopes
+
+
+def get_post_count(scope, queryset):
+    """Число постов в области из кеша; при промахе — один COUNT(*)."""
+    key = count_key(scope)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_TIMEOUT)
+    return count
+
+
+def invalidate_post_counts(post, group_ids=()):
+    cache.delete_many(
+        [count_key(scope) for scope in post_count_scopes(post, group_ids)]
+    )
+
+
+def generation_key(scope):
+    return f'posts:gen:{scope}'
+
+
+def _initial_generation():
+    # Ключ поколения может быть вытеснен из кеша; начальное значение
+    # из часов не повторит поколение, под которым лежат старые страницы.
+    return time.time_ns()
+
+
+def get_generations(scopes):
+    keys = [generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial_generation(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generations(scopes):
+    """Делает устаревшими все закешированные страницы этих областей."""
+    for scope in scopes:
+        key = generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), None)
+
+
+def feed_cache_context(*scopes):
+    """Переменные для {% cache %} ленты: ключ меняется с поколением."""
+    return {
+        'feed_version': '.'.join(map(str, get_generations(scopes))),
+        'feed_timeout': settings.POSTS_PAGE_CACHE_TIMEOUT,
+    }
+
+
+def post_page_scopes(post, group_slugs=()):
+    """Области страниц, на которых показывается пост."""
+    scopes = {'global', f'author:{post.author.username}'}
+    scopes.update(f'group:{slug}' for slug in group_slugs)
+    return scopes
+
+
+def card_key(post):
+    """Ключ отрендеренной карточки: новая версия поста — новый ключ."""
+    return f'posts:card:{post.pk}:{post.version}'
@@ -0,0 +1,117 @@
+"""Денормализованные счётчики постов, комментариев, подписок и картинок.
+
+Счётчики меняются атомарными UPDATE ... SET x = x + 1 в той же
+транзакции, что и запись; команда recount чинит накопившийся дрейф.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.utils import timezone
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, ImageBlob, Post, UserStats
+
+User = get_user_model()
+
+
+def _count_subquery(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field,
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+def recount_users(user_ids=None):
+    """Пересчитывает счётчики пользователей; без аргумента — всех."""
+    users = User.objects.all()
+    stats = UserStats.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+        stats = stats.filter(user_id__in=user_ids)
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in users.values_list('pk', flat=True)),
+        ignore_conflicts=True,
+    )
+    # OuterRef('pk') у UserStats — это id пользователя.
+    return stats.update(
+        posts_count=_count_subquery(Post.objects.all(), 'author'),
+        followers_count=_count_subquery(Follow.objects.all(), 'author'),
+        following_count=_count_subquery(Follow.objects.all(), 'user'),
+    )
+
+
+def recount_comments(post_ids=None):
+    posts = Post.objects.all()
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+    return posts.update(
+        comments_count=_count_subquery(Comment.objects.all(), 'post'),
+        version=F('version') + 1,
+    )
+
+
+def bump_user(user_id, **deltas):
+    if user_id is None:
+        return
+    updated = UserStats.objects.filter(user_id=user_id).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        # Строки ещё нет: считаем по таблицам, изменение уже в них.
+        # При уменьшении не создаём: это может быть каскадное удаление
+        # самого пользователя, а get_stats() досчитает строку сам.
+        recount_users([user_id])
+
+
+def bump_comments(post_id, delta):
+    # Число комментариев видно в карточке — меняем и её версию.
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta,
+        version=F('version') + 1,
+    )
+
+
+def bump_versions(posts):
+    """Новые ключи карточек постов, содержимое которых поменялось извне."""
+    return posts.update(version=F('version') + 1)
+
+
+def get_stats(user):
+    """Счётчики пользователя; строка создаётся при первом обращении."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        recount_users([user.pk])
+        return UserStats.objects.get(user_id=user.pk)
+
+
+def recount_images(names=None):
+    """Пересчитывает ссылки на файлы картинок; без аргумента — на все.
+
+    Строка появляется и у файла без ссылок, чтобы его нашёл gc_media.
+    """
+    blobs = ImageBlob.objects.all()
+    if names is None:
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True,
+        ).distinct()
+    else:
+        blobs = blobs.filter(name__in=names)
+    ImageBlob.objects.bulk_create(
+        (ImageBlob(name=name) for name in names if name),
+        ignore_conflicts=True,
+    )
+    return blobs.update(
+        refcount=_count_subquery(Post.objects.all(), 'image'),
+        updated=timezone.now(),
+    )
+
+
+def bump_image(name, delta):
+    if not name:
+        return
+    updated = ImageBlob.objects.filter(name=name).update(
+        refcount=F('refcount') + delta,
+        updated=timezone.now(),
+    )
+    if not updated:
+        recount_images([name])
@@ -1,6 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Comment, Post
+from .thumbnails import schedule_thumbnails
+from .uploads import validate_upload
 
 
 class PostForm(forms.ModelForm):
@@ -8,6 +11,42 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = 'text', 'group', 'image'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файлы, отброшенные StreamingImageUploadHandler, до полей
+        # не доходят: вместо «не картинка» покажем настоящую причину.
+        self.upload_errors = {
+            name: file_.upload_error
+            for name, file_ in self.files.items()
+            if getattr(file_, 'upload_error', None)
+        }
+        if self.upload_errors:
+            self.files = self.files.copy()
+            for name in self.upload_errors:
+                del self.files[name]
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            # Те же лимиты для файлов, пришедших не через обработчик.
+            error = validate_upload(image.size, image.image.size)
+            if error:
+                raise forms.ValidationError(error)
+        return image
+
+    def clean(self):
+        for name, error in self.upload_errors.items():
+            self.add_error(name, error)
+        return super().clean()
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        if commit and 'image' in self.changed_data and post.image:
+            # Миниатюры готовятся в фоне, пока пользователь
+            # переходит на страницу поста.
+            schedule_thumbnails(post.image.name)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
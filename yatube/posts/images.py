@@ -0,0 +1,32 @@
+"""Сведения о картинке поста, которые считаются один раз при загрузке."""
+import base64
+from io import BytesIO
+
+from PIL import Image
+
+# Сторона крошечной копии для размытой заглушки (LQIP).
+PLACEHOLDER_SIZE = 16
+
+
+def read_image_metadata(file_):
+    """Ширина, высота и заглушка картинки за одно открытие файла.
+
+    Заглушка — data: URI копии не больше PLACEHOLDER_SIZE точек,
+    шаблон растягивает её с размытием, пока грузится миниатюра.
+    """
+    file_.seek(0)
+    with Image.open(file_) as image:
+        width, height = image.size
+        # Для JPEG декодируется сразу уменьшенная копия.
+        image.draft('RGB', (PLACEHOLDER_SIZE * 8, PLACEHOLDER_SIZE * 8))
+        # Сначала уменьшаем, потом конвертируем: PNG и WebP не
+        # копируются в полном размере.
+        image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', quality=50)
+    file_.seek(0)
+    placeholder = 'data:image/jpeg;base64,' + base64.b64encode(
+        buffer.getvalue(),
+    ).decode()
+    return width, height, placeholder
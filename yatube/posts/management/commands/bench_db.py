@@ -0,0 +1,123 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import (
+    OperationalError, close_old_connections, connection, connections,
+    transaction,
+)
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+# Поведение Django по умолчанию: журнал отката, BEGIN DEFERRED,
+# новое соединение на каждый запрос.
+BASELINE = {
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {'pragmas': {'journal_mode': 'DELETE'}},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает базу потоками, пишущими посты и комментарии и читающими '
+        'ленту, с настройками из DATABASES и с настройками Django по '
+        'умолчанию. Пишет в базу — запускайте на копии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' or connection.settings_dict[
+            'NAME'
+        ] in ('', ':memory:'):
+            raise CommandError('Нужна база SQLite в файле.')
+        settings_dict = connection.settings_dict
+        tuned = {
+            'CONN_MAX_AGE': settings_dict['CONN_MAX_AGE'],
+            'OPTIONS': settings_dict['OPTIONS'],
+        }
+        self.author = User.objects.create_user(username='bench-db-author')
+        self.group = Group.objects.create(
+            title='bench-db', slug='bench-db', description='bench-db',
+        )
+        self.post = Post.objects.create(author=self.author, text='bench')
+        self.stdout.write(
+            f'{"настройки":<12}{"постов/с":>10}{"коммент./с":>12}'
+            f'{"чтений/с":>10}{"locked":>8}'
+        )
+        try:
+            for label, config in (('Django', BASELINE), ('DATABASES', tuned)):
+                connections.close_all()
+                settings_dict.update(config)
+                self._report(label, self._run(options))
+        finally:
+            connections.close_all()
+            settings_dict.update(tuned)
+            self.author.delete()
+            self.group.delete()
+
+    def _run(self, options):
+        stop = time.monotonic() + options['seconds']
+        totals = {'posts': 0, 'comments': 0, 'reads': 0, 'locked': 0}
+        lock = threading.Lock()
+
+        def worker(step):
+            counts = dict.fromkeys(totals, 0)
+            try:
+                while time.monotonic() < stop:
+                    try:
+                        counts[step()] += 1
+                    except OperationalError as error:
+                        if 'locked' not in str(error):
+                            raise
+                        counts['locked'] += 1
+                    # Как в конце запроса: при CONN_MAX_AGE = 0 закрывает.
+                    close_old_connections()
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in counts.items():
+                        totals[key] += value
+
+        steps = (
+            [self._write_post, self._write_comment] * options['writers']
+        )[:options['writers']] + [self._read] * options['readers']
+        threads = [threading.Thread(target=worker, args=(step,))
+                   for step in steps]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {
+            key: value / options['seconds'] for key, value in totals.items()
+        }
+
+    def _write_post(self):
+        # Как post_create: чтение и запись в одной транзакции.
+        with transaction.atomic():
+            group = Group.objects.get(pk=self.group.pk)
+            Post.objects.create(author=self.author, group=group, text='b')
+        return 'posts'
+
+    def _write_comment(self):
+        with transaction.atomic():
+            post = Post.objects.get(pk=self.post.pk)
+            Comment.objects.create(post=post, author=self.author, text='b')
+        return 'comments'
+
+    def _read(self):
+        list(Post.objects.for_feed()[:10])
+        list(self.post.comments.all()[:10])
+        return 'reads'
+
+    def _report(self, label, rates):
+        self.stdout.write(
+            f'{label:<12}{rates["posts"]:>10.0f}{rates["comments"]:>12.0f}'
+            f'{rates["reads"]:>10.0f}{rates["locked"]:>8.0f}'
+        )
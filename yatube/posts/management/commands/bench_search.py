@@ -0,0 +1,49 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Post
+from posts.paginator import PER_PAGE
+from posts.search import is_available, search_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает первую страницу поиска через FTS5 и через '
+        'LIKE на текущей базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='+', help='Поисковые запросы.')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз повторить каждый запрос.',
+        )
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError('Полнотекстового индекса нет.')
+        self.stdout.write(
+            f'Постов: {Post.objects.count()}; время — медиана, мс',
+        )
+        self.stdout.write(f'{"запрос":<24}{"LIKE":>10}{"FTS5":>10}')
+        for query in options['queries']:
+            like = self._measure(options['repeat'], lambda: list(
+                Post.objects.for_feed().filter(
+                    text__icontains=query,
+                )[:PER_PAGE]
+            ))
+            fts = self._measure(options['repeat'], lambda: list(
+                search_posts(query)[:PER_PAGE]
+            ))
+            self.stdout.write(f'{query:<24}{like:>10.2f}{fts:>10.2f}')
+
+    @staticmethod
+    def _measure(repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,243 @@
+import json
+import math
+import platform
+import statistics
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.metrics import collect_metrics
+from posts import urls
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Представления, которые бенчмарк вызывает POST-запросом.
+POST_DATA = {'add_comment': {'text': 'Комментарий бенчмарка'}}
+# Из результатов в --compare: (ключ, подпись, формат).
+COMPARED = (
+    ('p50_ms', 'p50', '.1f'),
+    ('p95_ms', 'p95', '.1f'),
+    ('p99_ms', 'p99', '.1f'),
+    ('queries', 'SQL', 'd'),
+    ('alloc_peak_kb', 'КиБ', '.0f'),
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    """Ближайший ранг: значение, не меньше которого fraction выборки."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все страницы posts:* через тестовый клиент и выводит '
+        'p50/p95/p99, число SQL-запросов и пик выделенной памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*',
+            help='Только эти страницы (index, profile, ...).',
+        )
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--memory-iterations', type=int, default=3,
+            help='Отдельные прогоны под tracemalloc: он сам замедляет код.',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.',
+        )
+        parser.add_argument('--output', help='Сохранить результаты в JSON.')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения.',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должно быть больше нуля.')
+        self.options = options
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as stream:
+                baseline = json.load(stream)
+        # Записи (комментарии, подписки) откатываются, кеш очищается
+        # до и после: два прогона на одной базе сравнимы.
+        cache.clear()
+        try:
+            with override_settings(REQUEST_METRICS_SAMPLE_RATE=0), \
+                    transaction.atomic():
+                results = self.run(self.targets())
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            cache.clear()
+        report = {'meta': self.meta(), 'results': results}
+        self.print_table(results, baseline and baseline['results'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты: {options["output"]}')
+
+    def targets(self):
+        """(имя, метод, путь, данные, клиент) для каждого URL posts:*."""
+        post = Post.objects.order_by('-comments_count', '-pk').first()
+        group = Group.objects.annotate(
+            total=Count('posts'),
+        ).order_by('-total').first()
+        reader = User.objects.annotate(
+            total=Count('follower'),
+        ).order_by('-total').first()
+        if post is None or group is None:
+            raise CommandError('База пуста: сначала manage.py seed_load.')
+        author = post.author
+        reader_client, author_client = Client(), Client()
+        reader_client.force_login(reader)
+        author_client.force_login(author)
+        kwargs = {
+            'slug': group.slug,
+            'username': author.username,
+            'post_id': post.pk,
+        }
+        query = {'q': post.text.split()[0]}
+        targets = []
+        for pattern in urls.urlpatterns:
+            name = pattern.name
+            if self.options['names'] and name not in self.options['names']:
+                continue
+            path = reverse(f'posts:{name}', kwargs={
+                key: kwargs[key] for key in pattern.pattern.converters
+            })
+            client = author_client if name == 'post_edit' else reader_client
+            if name in POST_DATA:
+                targets.append((name, 'POST', path, POST_DATA[name], client))
+            else:
+                data = query if name == 'search' else {}
+                targets.append((name, 'GET', path, data, client))
+        return targets
+
+    def request(self, method, path, data, client):
+        if self.options['cold']:
+            cache.clear()
+        send = client.post if method == 'POST' else client.get
+        with collect_metrics() as metrics:
+            response = send(path, data)
+        return response.status_code, metrics
+
+    def run(self, targets):
+        samples = {target[0]: [] for target in targets}
+        statuses = {target[0]: set() for target in targets}
+        # Страницы по очереди в каждом круге: подписка и отписка
+        # чередуются, шум машины делится между всеми страницами.
+        rounds = self.options['warmup'] + self.options['iterations']
+        for number in range(rounds):
+            for name, *request in targets:
+                status, metrics = self.request(*request)
+                statuses[name].add(status)
+                if number >= self.options['warmup']:
+                    samples[name].append(metrics)
+        peaks = self.measure_memory(targets)
+        results = {}
+        for name, method, path, data, _ in targets:
+            timings = [metrics.total_ms for metrics in samples[name]]
+            queries = [metrics.db_queries for metrics in samples[name]]
+            results[f'posts:{name}'] = {
+                'method': method,
+                'path': path,
+                'status': sorted(statuses[name]),
+                'p50_ms': round(percentile(timings, 0.50), 2),
+                'p95_ms': round(percentile(timings, 0.95), 2),
+                'p99_ms': round(percentile(timings, 0.99), 2),
+                'mean_ms': round(statistics.mean(timings), 2),
+                'queries': round(statistics.median(queries)),
+                'queries_max': max(queries),
+                'db_ms': round(statistics.median(
+                    metrics.db_ms for metrics in samples[name]
+                ), 2),
+                'template_ms': round(statistics.median(
+                    metrics.template_ms for metrics in samples[name]
+                ), 2),
+                'alloc_peak_kb': peaks.get(name),
+            }
+        return results
+
+    def measure_memory(self, targets):
+        """Медиана пика выделенной за запрос памяти, КиБ."""
+        if self.options['memory_iterations'] < 1:
+            return {}
+        peaks = {target[0]: [] for target in targets}
+        for _ in range(self.options['memory_iterations']):
+            for name, *request in targets:
+                # Сбор заново на каждый запрос: пик считается от нуля
+                # (tracemalloc.reset_peak() есть только с Python 3.9).
+                tracemalloc.start()
+                try:
+                    self.request(*request)
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+                peaks[name].append(peak / 1024)
+        return {
+            name: round(statistics.median(values), 1)
+            for name, values in peaks.items()
+        }
+
+    def meta(self):
+        return {
+            'created': timezone.now().isoformat(),
+            'iterations': self.options['iterations'],
+            'cold_cache': self.options['cold'],
+            'follow_feed_engine': settings.POSTS_FOLLOW_FEED_ENGINE,
+            'cache_backend': settings.CACHES['default']['BACKEND'],
+            'rows': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        }
+
+    def print_table(self, results, baseline=None):
+        header = f'{"страница":<24}{"статус":>8}'
+        header += ''.join(f'{label:>10}' for _, label, _ in COMPARED)
+        self.stdout.write(header)
+        for name, result in results.items():
+            status = ','.join(map(str, result['status']))
+            line = f'{name:<24}{status:>8}'
+            for key, _, spec in COMPARED:
+                value = result[key]
+                line += f'{"—" if value is None else format(value, spec):>10}'
+            self.stdout.write(line)
+            old = (baseline or {}).get(name)
+            if old is not None:
+                self.stdout.write(f'{"  изменение":<32}' + ''.join(
+                    f'{self.delta(old.get(key), result[key]):>10}'
+                    for key, _, _ in COMPARED
+                ))
+
+    @staticmethod
+    def delta(old, new):
+        if old is None or new is None:
+            return '—'
+        if old == 0:
+            return f'{new - old:+g}'
+        return f'{(new - old) / old:+.0%}'
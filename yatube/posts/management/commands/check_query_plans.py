@@ -0,0 +1,134 @@
+import re
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.paginator import FORWARD, PER_PAGE, encode_cursor
+
+User = get_user_model()
+
+# «SCAN posts_post» без индекса — проход по всей таблице.
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """Планы запросов страниц постов на данных и статистике базы.
+
+    Данные для страниц пишутся в одной транзакции и откатываются, но
+    пока идёт проверка, транзакция держит блокировку записи. Поэтому
+    запускать на копии, а не на рабочей базе:
+
+        sqlite3 db.sqlite3 ".backup /tmp/plans.sqlite3"
+        YATUBE_DB_PATH=/tmp/plans.sqlite3 python manage.py check_query_plans
+    """
+
+    help = (
+        'Проверяет EXPLAIN QUERY PLAN запросов страниц постов: '
+        'без полного прохода по таблице и без временной сортировки. '
+        'Блокирует запись в базу на время проверки — запускайте на '
+        'копии (YATUBE_DB_PATH).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы всех запросов, а не только плохих.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN есть только у SQLite.')
+        self.verbose = options['verbose_plans']
+        self.problems = 0
+        dummy_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }}
+        # Данные для страниц создаются в транзакции и откатываются;
+        # кеш выключен, чтобы каждая страница дошла до базы.
+        try:
+            with override_settings(CACHES=dummy_cache), transaction.atomic():
+                self._check_pages(*self._create_fixtures())
+                raise Rollback
+        except Rollback:
+            pass
+        if self.problems:
+            raise CommandError(f'Плохих планов запросов: {self.problems}')
+        self.stdout.write(self.style.SUCCESS('Все планы запросов в порядке'))
+
+    def _create_fixtures(self):
+        # Имена не совпадут с уже существующими в базе.
+        suffix = uuid.uuid4().hex[:12]
+        reader = User.objects.create_user(username=f'plan-reader-{suffix}')
+        author = User.objects.create_user(username=f'plan-author-{suffix}')
+        group = Group.objects.create(
+            title='План', slug=f'plan-group-{suffix}', description='План',
+        )
+        Follow.objects.create(user=reader, author=author)
+        for number in range(PER_PAGE + 2):
+            Post.objects.create(
+                author=author, group=group, text=f'План {number}',
+            )
+        post = Post.objects.order_by('-pub_date', '-pk')[PER_PAGE - 1]
+        Comment.objects.create(post=post, author=reader, text='План')
+        return reader, author, group, post
+
+    def _check_pages(self, reader, author, group, post):
+        cursor = '?cursor=' + encode_cursor(FORWARD, post.pub_date, post.pk)
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[group.slug]),
+            reverse('posts:profile', args=[author.username]),
+        ]
+        urls = [
+            url + suffix for url in pages for suffix in ('', '?page=2', cursor)
+        ]
+        urls.append(reverse('posts:post_detail', args=[post.pk]))
+        client = Client()
+        for url in urls:
+            self._check_url(client, url)
+        # Лента подписок — с движком из настроек: у "sql" и у номеров
+        # страниц "merge" сортировка постов многих авторов неизбежна.
+        client.force_login(reader)
+        follow = reverse('posts:follow_index')
+        for url in (follow, follow + '?page=2', follow + cursor):
+            self._check_url(client, url)
+
+    def _check_url(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            plan = self.explain(sql)
+            bad = [
+                step for step in plan
+                if FULL_SCAN.match(step) or TEMP_SORT in step
+            ]
+            self.problems += bool(bad)
+            if bad or self.verbose:
+                self.stdout.write(
+                    self.style.ERROR(f'ПЛОХО {url}') if bad else url,
+                )
+                self.stdout.write(f'  {sql}')
+                for step in plan:
+                    self.stdout.write(f'    {step}')
+
+    @staticmethod
+    def explain(sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from posts.transfer import MODELS, Progress, dump_row, open_stream
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в JSON Lines (см. posts/transfer.py).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл; *.gz сжимается, - — stdout (по умолчанию).',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Строк за одно чтение из базы.',
+        )
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Откуда выгружать: реплика не держит основную базу '
+                 'и не меняется во время выгрузки.',
+        )
+
+    def handle(self, *args, **options):
+        # Ход выгрузки — в stderr: в stdout может идти сам файл.
+        progress = Progress(self.stderr.write)
+        with open_stream(options['path'], 'w') as stream:
+            for label, (model, fields) in MODELS.items():
+                rows = model._default_manager.using(
+                    options['database'],
+                ).order_by('pk').values_list('pk', *fields)
+                for pk, *values in rows.iterator(options['chunk_size']):
+                    row = dict(zip(fields, values))
+                    stream.write(dump_row(label, pk, row))
+                    progress.step(label)
+        progress.finish()
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено строк: {progress.total} за {progress.elapsed:.1f} с',
+        ))
@@ -0,0 +1,82 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from posts.counters import recount_images
+from posts.models import ImageBlob, Post
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы картинок, на которые не ссылается ни один пост.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Не трогать файлы, менявшиеся за это время.',
+        )
+        parser.add_argument(
+            '--scan', action='store_true',
+            help='Искать и файлы, которых нет в ImageBlob.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        self.storage = field.storage
+        self.cutoff = timezone.now() - timedelta(
+            hours=options['grace_hours'],
+        )
+        self.dry_run = options['dry_run']
+        names = set(ImageBlob.objects.filter(
+            refcount__lte=0, updated__lt=self.cutoff,
+        ).values_list('name', flat=True))
+        if options['scan']:
+            known = set(ImageBlob.objects.values_list('name', flat=True))
+            names.update(
+                name for name in self._walk(field.upload_to.rstrip('/'))
+                if name not in known
+            )
+        removed = freed = 0
+        for name in sorted(names):
+            size = self._collect(name)
+            if size is not None:
+                removed += 1
+                freed += size
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {removed}, освобождено: '
+            f'{filesizeformat(freed)}',
+        ))
+
+    def _walk(self, path):
+        if not self.storage.exists(path):
+            return
+        directories, files = self.storage.listdir(path)
+        for name in files:
+            yield posixpath.join(path, name)
+        for directory in directories:
+            yield from self._walk(posixpath.join(path, directory))
+
+    def _collect(self, name):
+        """Удаляет файл с миниатюрами; None — если он ещё нужен."""
+        if Post.objects.filter(image=name).exists():
+            # Счётчик разошёлся с таблицей постов: чиним и не трогаем.
+            recount_images([name])
+            return None
+        size = 0
+        if self.storage.exists(name):
+            if self.storage.get_modified_time(name) >= self.cutoff:
+                return None
+            size = self.storage.size(name)
+        self.stdout.write(name)
+        if not self.dry_run:
+            delete(ImageFile(name, self.storage))
+            ImageBlob.objects.filter(name=name, refcount__lte=0).delete()
+        return size
@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import (
+    generate_thumbnails, init_process, run_in_worker,
+)
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие варианты картинок постов на всех ядрах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 1 — без пула, в текущем процессе.',
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='').order_by().values_list(
+                'image', flat=True,
+            ).distinct()
+        )
+        workers = max(1, min(options['workers'], len(names) or 1))
+        if workers == 1:
+            results = map(generate_thumbnails, names)
+            self._report(results, len(names))
+            return
+        # Дочерние процессы откроют свои соединения сами.
+        connections.close_all()
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=init_process,
+        ) as executor:
+            self._report(executor.map(run_in_worker, names), len(names))
+
+    def _report(self, results, total):
+        ready = 0
+        for done, result in enumerate(results, 1):
+            ready += bool(result)
+            if done % 100 == 0:
+                self.stdout.write(f'{done}/{total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок с готовыми вариантами: {ready} из {total}',
+        ))
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from posts.transfer import (
+    Importer, Progress, keep_dates, load_row, open_stream, rebuild_derived,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает файл export_yatube одной транзакцией '
+        'и пересчитывает производные данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл; *.gz читается как gzip, - — stdin (по умолчанию).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Строк в одном bulk_create.',
+        )
+
+    def handle(self, *args, **options):
+        progress = Progress(self.stdout.write)
+        try:
+            with transaction.atomic(), keep_dates():
+                importer = Importer(options['batch_size'], progress.step)
+                self.load(importer, options['path'])
+                progress.finish()
+                self.rebuild()
+        except IntegrityError as error:
+            raise CommandError(f'Файл не согласован с базой: {error}')
+        loaded = ', '.join(
+            f'{label}: {count}' for label, count in importer.counts.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено за {progress.elapsed:.1f} с — {loaded}',
+        ))
+
+    def load(self, importer, path):
+        with open_stream(path, 'r') as stream:
+            for number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    importer.add(*load_row(line))
+                except (ValueError, KeyError, TypeError) as error:
+                    raise CommandError(f'Строка {number}: {error}')
+        importer.flush()
+
+    def rebuild(self):
+        started = time.monotonic()
+        rebuild_derived()
+        self.stdout.write(
+            f'Счётчики, поиск и ленты пересчитаны '
+            f'за {time.monotonic() - started:.1f} с'
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.search import is_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс постов.'
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError(
+                'Индекса нет: нужна SQLite с FTS5 и миграция posts 0013.',
+            )
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {count}',
+        ))
@@ -0,0 +1,247 @@
+import itertools
+import random
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from posts.images import read_image_metadata
+from posts.models import Comment, Follow, Group, Post
+from posts.transfer import Progress, keep_dates, rebuild_derived
+
+User = get_user_model()
+
+# Пароль всех созданных пользователей.
+PASSWORD = 'seed-password'
+
+
+class ZipfSampler:
+    """Выбор из population с весом 1 / rank ** s.
+
+    Ранги перемешаны, поэтому популярность не совпадает с порядком
+    первичных ключей.
+    """
+
+    def __init__(self, population, s, rng):
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = list(itertools.accumulate(
+            1 / rank ** s for rank in range(1, len(self.population) + 1)
+        ))
+        self.rng = rng
+
+    def sample(self, k=1):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights, k=k,
+        )
+
+    def one(self):
+        return self.sample()[0]
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу правдоподобными данными с перекосом: немногие '
+        'авторы пишут и собирают подписчиков больше остальных (Zipf).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=40000)
+        parser.add_argument(
+            '--follows', type=float, default=10,
+            help='Среднее число подписок на пользователя.',
+        )
+        parser.add_argument(
+            '--images', type=int, default=20,
+            help='Сколько разных файлов картинок создать.',
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.1,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель перекоса: 0 — равномерно.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить посты.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['posts'] < 1:
+            raise CommandError('Нужны хотя бы 2 пользователя и 1 пост.')
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.progress = Progress(self.stdout.write)
+        self.now = timezone.now()
+        with transaction.atomic(), keep_dates():
+            user_ids = self.create_users()
+            # Одни и те же популярные авторы больше пишут
+            # и собирают больше подписчиков.
+            self.authors = self.sampler(user_ids)
+            group_ids = self.create_groups()
+            images = self.create_images()
+            post_ids = self.create_posts(user_ids, group_ids, images)
+            self.create_comments(user_ids, post_ids)
+            self.create_follows(user_ids)
+            self.progress.finish()
+            rebuild_derived()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк: {self.progress.total} '
+            f'за {self.progress.elapsed:.1f} с; пароль — {PASSWORD}',
+        ))
+
+    def sampler(self, population):
+        return ZipfSampler(population, self.options['zipf'], self.rng)
+
+    def insert(self, model, objects):
+        label = model._meta.label_lower
+        for batch in batches(objects, self.options['batch_size']):
+            model.objects.bulk_create(batch, ignore_conflicts=model is Follow)
+            self.progress.step(label, len(batch))
+
+    def next_pk(self, model):
+        return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+    def create_users(self):
+        start = self.next_pk(User)
+        password = make_password(PASSWORD)
+        count = self.options['users']
+        self.insert(User, (
+            User(
+                pk=pk,
+                username=f'{self.fake.user_name()}_{pk}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+                date_joined=self.now - timedelta(days=self.options['days']),
+            )
+            for pk in range(start, start + count)
+        ))
+        return range(start, start + count)
+
+    def create_groups(self):
+        start = self.next_pk(Group)
+        count = self.options['groups']
+        words = self.fake.words(count, unique=True) if count else []
+        self.insert(Group, (
+            Group(
+                pk=pk,
+                title=word.capitalize(),
+                # Слаг в URL только латиницей.
+                slug=f'group-{pk}',
+                description=self.fake.paragraph(),
+            )
+            for pk, word in zip(range(start, start + count), words)
+        ))
+        return range(start, start + count)
+
+    def create_images(self):
+        """Разные картинки; одинаковые файлы хранилище хранит один раз."""
+        storage = Post._meta.get_field('image').storage
+        images = []
+        for number in range(self.options['images']):
+            image = Image.new('RGB', (960, 540), self.random_color())
+            draw = ImageDraw.Draw(image)
+            for _ in range(8):
+                x, y = self.rng.randrange(960), self.rng.randrange(540)
+                draw.ellipse(
+                    (x, y, x + self.rng.randrange(50, 400),
+                     y + self.rng.randrange(50, 300)),
+                    fill=self.random_color(),
+                )
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=80)
+            content = ContentFile(buffer.getvalue())
+            name = storage.save(f'posts/seed-{number}.jpg', content)
+            images.append((name, *read_image_metadata(content)))
+        return images
+
+    def random_color(self):
+        return tuple(self.rng.randrange(256) for _ in range(3))
+
+    def create_posts(self, user_ids, group_ids, images):
+        """Посты по порядку дат: ключи растут вместе с pub_date."""
+        start = self.next_pk(Post)
+        count = self.options['posts']
+        authors = self.authors
+        groups = self.sampler(group_ids) if group_ids else None
+        pictures = self.sampler(images) if images else None
+        sentences = [self.fake.sentence() for _ in range(2000)]
+        span = timedelta(days=self.options['days'])
+        step = span / count
+        self.pub_date = lambda pk: self.now - span + step * (pk - start)
+
+        def build(pk):
+            post = Post(
+                pk=pk,
+                author_id=authors.one(),
+                text=' '.join(self.rng.sample(
+                    sentences, self.rng.randint(1, 6),
+                )),
+                pub_date=self.pub_date(pk),
+            )
+            if groups is not None and self.rng.random() < 0.7:
+                post.group_id = groups.one()
+            if (pictures is not None
+                    and self.rng.random() < self.options['image_share']):
+                (post.image, post.image_width, post.image_height,
+                 post.image_placeholder) = pictures.one()
+            return post
+
+        self.insert(Post, map(build, range(start, start + count)))
+        return range(start, start + count)
+
+    def create_comments(self, user_ids, post_ids):
+        authors = self.sampler(user_ids)
+        posts = self.sampler(post_ids)
+        texts = [self.fake.sentence()[:100] for _ in range(500)]
+
+        def build(_):
+            post_id = posts.one()
+            delay = timedelta(hours=self.rng.expovariate(1 / 24))
+            return Comment(
+                post_id=post_id,
+                author_id=authors.one(),
+                text=self.rng.choice(texts),
+                created=min(self.pub_date(post_id) + delay, self.now),
+            )
+
+        self.insert(Comment, map(build, range(self.options['comments'])))
+
+    def create_follows(self, user_ids):
+        authors = self.authors
+        rate = 1 / self.options['follows'] if self.options['follows'] else 0
+
+        def follows():
+            for user_id in user_ids:
+                wanted = round(self.rng.expovariate(rate)) if rate else 0
+                for author_id in set(authors.sample(wanted)) - {user_id}:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.insert(Follow, follows())
@@ -0,0 +1,66 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.defaultfilters import filesizeformat
+
+
+def copy_database(source, target_name, timeout=30):
+    """Копирует открытую базу source в файл target_name через backup API.
+
+    Копия согласованная: backup читает один снимок основной базы, а
+    читатели реплики в WAL до конца копирования видят прежние данные.
+    """
+    target = sqlite3.connect(target_name, timeout=timeout)
+    try:
+        source.backup(target)
+        page_size, = target.execute('PRAGMA page_size').fetchone()
+        page_count, = target.execute('PRAGMA page_count').fetchone()
+    finally:
+        target.close()
+    return page_size * page_count
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite на реплики для чтения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Обновить только эти реплики (по умолчанию все).',
+        )
+        parser.add_argument(
+            '--interval', type=float,
+            help='Повторять каждые столько секунд, пока не прервут.',
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('Реплики не настроены: YATUBE_DB_REPLICAS.')
+        primary = connections[DEFAULT_DB_ALIAS]
+        for alias in aliases:
+            if alias not in settings.DATABASE_REPLICAS:
+                raise CommandError(f'{alias} не реплика.')
+            name = connections[alias].settings_dict['NAME']
+            if name == primary.settings_dict['NAME']:
+                raise CommandError(f'{alias} указывает на основную базу.')
+        while True:
+            self.sync(primary, aliases)
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, primary, aliases):
+        primary.ensure_connection()
+        for alias in aliases:
+            started = time.perf_counter()
+            size = copy_database(
+                primary.connection, connections[alias].settings_dict['NAME'],
+            )
+            self.stdout.write(
+                f'{alias}: {filesizeformat(size)} '
+                f'за {time.perf_counter() - started:.2f} с'
+            )
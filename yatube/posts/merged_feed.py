@@ -0,0 +1,121 @@
+"""Лента подписок, собираемая при чтении (fan-out on read).
+
+Для каждого автора в кеше лежит ограниченный список последних постов
+[(pub_date в микросекундах, id), ...]. Страница ленты — k-путевое слияние
+списков авторов, на которых подписан пользователь, и один запрос за
+самими постами. Таблица Follow остаётся единственным источником правды.
+"""
+import heapq
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Post
+from .paginator import FORWARD, CursorPaginator
+
+RECENT_TIMEOUT: int = 60 * 60 * 24
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def recent_key(author_id):
+    return f'posts:recent:{author_id}'
+
+
+def feed_key(pub_date, pk):
+    # Целые микросекунды: float теряет точность на современных датах.
+    return (pub_date - EPOCH) // timedelta(microseconds=1), pk
+
+
+def load_recent(author_id):
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk',
+    ).values_list('pub_date', 'pk')
+    return [
+        feed_key(pub_date, pk)
+        for pub_date, pk in posts[:settings.POSTS_RECENT_POSTS_LIMIT]
+    ]
+
+
+def refresh_recent(author_id):
+    cache.set(recent_key(author_id), load_recent(author_id), RECENT_TIMEOUT)
+
+
+def forget_recent(author_id):
+    cache.delete(recent_key(author_id))
+
+
+def get_recent(author_ids):
+    """Списки последних постов авторов; промахи добираются из БД."""
+    keys = {recent_key(author_id): author_id for author_id in author_ids}
+    found = cache.get_many(keys)
+    missing = {
+        key: load_recent(author_id)
+        for key, author_id in keys.items() if key not in found
+    }
+    if missing:
+        cache.set_many(missing, RECENT_TIMEOUT)
+    found.update(missing)
+    return list(found.values())
+
+
+def merge_author_ids(user):
+    """Авторы для слияния или None, если подписок слишком много."""
+    author_ids = list(
+        user.follower.values_list('author_id', flat=True)[
+            :settings.POSTS_MERGE_MAX_AUTHORS + 1
+        ]
+    )
+    if len(author_ids) > settings.POSTS_MERGE_MAX_AUTHORS:
+        return None
+    return author_ids
+
+
+class MergedFeedPaginator(CursorPaginator):
+    """Курсорная пагинация поверх слияния кешированных списков авторов.
+
+    object_list — обычный SQL-запрос ленты: он нужен, когда страница
+    уходит глубже, чем покрывают обрезанные списки.
+    """
+
+    def __init__(self, object_list, per_page, author_ids):
+        super().__init__(object_list, per_page)
+        self.author_ids = author_ids
+
+    def _merge(self, position):
+        lists = get_recent(self.author_ids)
+        limit = settings.POSTS_RECENT_POSTS_LIMIT
+        # Ниже последнего элемента обрезанного списка посты могут теряться.
+        floor = max(
+            (items[-1] for items in lists if len(items) >= limit),
+            default=None,
+        )
+        merged = heapq.merge(*lists, reverse=True)
+        if position is None:
+            direction, cursor = FORWARD, None
+        else:
+            direction, pub_date, pk = position
+            cursor = feed_key(pub_date, pk)
+        if direction == FORWARD:
+            page = []
+            for item in merged:
+                if cursor is None or item < cursor:
+                    page.append(item)
+                    if len(page) > self.per_page:
+                        break
+            if floor is not None and (
+                    len(page) <= self.per_page
+                    or page[self.per_page - 1] < floor):
+                return None
+            return page
+        if floor is not None and cursor < floor:
+            return None
+        newer = [item for item in merged if item > cursor]
+        return newer[-self.per_page - 1:][::-1]
+
+    def _fetch(self, position):
+        page = self._merge(position)
+        if page is None:
+            return super()._fetch(position)
+        posts = Post.objects.for_feed().in_bulk([pk for _, pk in page])
+        return [posts[pk] for _, pk in page if pk in posts]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:35
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+from posts.images import read_image_metadata
+
+
+def fill_image_metadata(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    images = Post.objects.exclude(image='').values_list('pk', 'image')
+    for pk, name in images.iterator():
+        try:
+            with default_storage.open(name) as file_:
+                width, height, placeholder = read_image_metadata(file_)
+        except (OSError, SuspiciousFileOperation):
+            continue
+        Post.objects.filter(pk=pk).update(
+            image_width=width,
+            image_height=height,
+            image_placeholder=placeholder,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False, help_text='data: URI крошечной копии картинки', verbose_name='Заглушка картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(fill_image_metadata, migrations.RunPython.noop),
+    ]
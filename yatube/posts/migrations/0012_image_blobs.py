@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:43
+
+from django.db import migrations, models
+import posts.storage
+
+
+def count_image_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+    refs = Post.objects.exclude(image='').values('image').annotate(
+        total=models.Count('pk'),
+    ).order_by()
+    ImageBlob.objects.bulk_create(
+        (ImageBlob(name=row['image'], refcount=row['total'])
+         for row in refs.iterator()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_image_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Имя файла')),
+                ('refcount', models.IntegerField(default=0, verbose_name='Число ссылок')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Последнее изменение')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+                'verbose_name_plural': 'Файлы картинок',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(count_image_refs, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F
+
+from .images import read_image_metadata
+from .storage import post_image_storage
 
 User = get_user_model()
 
@@ -24,6 +28,29 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # Поля пользователя, которые карточка поста никогда не показывает.
+    FEED_DEFERRED_FIELDS = (
+        'author__password',
+        'author__last_login',
+        'author__is_superuser',
+        'author__email',
+        'author__is_staff',
+        'author__is_active',
+        'author__date_joined',
+        'group__description',
+    )
+
+    def for_feed(self):
+        """Посты для карточек ленты: автор и группа в одном запросе.
+
+        Число комментариев хранится в самом посте (comments_count).
+        """
+        return self.select_related('author', 'group').defer(
+            *self.FEED_DEFERRED_FIELDS,
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -39,12 +66,14 @@ class Post(models.Model):
         on_delete=models.CASCADE,
         related_name="posts",
         verbose_name='Автор',
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
         blank=True,
         null=True,
+        db_index=False,
         related_name="posts",
         verbose_name='Группа',
         help_text='Выберите группу',
@@ -52,17 +81,117 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
+        blank=True,
+    )
+    image_width = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Ширина картинки',
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Высота картинки',
+    )
+    image_placeholder = models.TextField(
         blank=True,
+        editable=False,
+        verbose_name='Заглушка картинки',
+        help_text='data: URI крошечной копии картинки',
+    )
+    comments_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name='Версия',
+        help_text='Растёт при каждом изменении поста',
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date', )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты автора и группы идут по индексу без сортировки;
+        # отдельные индексы внешних ключей — их префиксы. Столбцы
+        # по возрастанию: обратный проход даёт pub_date DESC, id DESC
+        # (rowid в конце записи индекса всегда по возрастанию).
+        indexes = (
+            models.Index(fields=('author', 'pub_date'),
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=('group', 'pub_date'),
+                         name='post_group_pub_date_idx'),
+        )
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        if not self.image:
+            self.image_width = self.image_height = None
+            self.image_placeholder = ''
+        elif not self.image._committed:
+            # Новый файл ещё в памяти или во временном файле загрузки:
+            # читаем его до того, как он уйдёт в хранилище.
+            try:
+                (self.image_width, self.image_height,
+                 self.image_placeholder) = read_image_metadata(
+                    self.image.file,
+                )
+            except OSError:
+                # Не картинка для Pillow: пост сохраняется без заглушки.
+                self.image_width = self.image_height = None
+                self.image_placeholder = ''
+        if not self._state.adding:
+            # Новая версия — новый ключ закешированной карточки.
+            # Увеличивает сама база: одновременные правки не получат
+            # одну и ту же версию.
+            self.version = F('version') + 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+                if 'image' in update_fields:
+                    kwargs['update_fields'] |= {
+                        'image_width', 'image_height', 'image_placeholder',
+                    }
+        super().save(*args, **kwargs)
+        if not isinstance(self.version, int):
+            self.refresh_from_db(fields=['version'])
+
+
+class ImageBlob(models.Model):
+    """Файл картинки в хранилище и число постов, которые на него ссылаются.
+
+    Счётчик меняется в signals.py; файлы с нулём ссылок удаляет gc_media.
+    """
+
+    name = models.CharField(
+        max_length=255,
+        primary_key=True,
+        verbose_name='Имя файла',
+    )
+    refcount = models.IntegerField(
+        default=0,
+        verbose_name='Число ссылок',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Последнее изменение',
+    )
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return self.name
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -71,6 +200,7 @@ class Comment(models.Model):
         related_name='comments',
         verbose_name='Пост',
         help_text='Пост, к которому будет оставлен комментарий',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -92,6 +222,8 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created', )
+        indexes = (models.Index(fields=('post', '-created'),
+                                name='comment_post_created_idx'), )
 
 
 class Follow(models.Model):
@@ -102,6 +234,7 @@ class Follow(models.Model):
         blank=True,
         null=True,
         verbose_name='Имя подписчика',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -110,8 +243,67 @@ class Follow(models.Model):
         blank=True,
         null=True,
         verbose_name='Имя автора',
+        db_index=False,
     )
 
     class Meta:
         constraints = (models.UniqueConstraint(fields=('user', 'author'),
                                                name='unique_following'), )
+        # Подписчики автора; подписки пользователя читаются по
+        # уникальному индексу (user, author).
+        indexes = (models.Index(fields=('author', 'user'),
+                                name='follow_author_user_idx'), )
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые при записи (см. counters.py)."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.IntegerField(
+        default=0, verbose_name='Число постов',
+    )
+    followers_count = models.IntegerField(
+        default=0, verbose_name='Число подписчиков',
+    )
+    following_count = models.IntegerField(
+        default=0, verbose_name='Число подписок',
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации поста',
+    )
+
+    class Meta:
+        # post_id, а не post: иначе порядок пойдёт по Meta.ordering
+        # поста через JOIN и мимо индекса.
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = (models.UniqueConstraint(fields=('user', 'post'),
+                                               name='unique_timeline_post'), )
+        indexes = (models.Index(fields=('user', '-pub_date', '-post'),
+                                name='timeline_user_pub_date_idx'), )
@@ -1,10 +1,234 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
+from math import ceil
+
+from django.core.paginator import (
+    EmptyPage, Page, PageNotAnInteger, Paginator,
+)
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .caching import get_post_count
 
 PER_PAGE: int = 10
 
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_cursor(direction, pub_date, pk):
+    """Упаковывает позицию в ленте в непрозрачный токен для ?cursor=."""
+    raw = json.dumps([direction, pub_date.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (направление, pub_date, pk) или None для битого токена."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, pub_date, pk = json.loads(raw.decode())
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (pub_date, id) без OFFSET и COUNT(*).
+
+    Каждая страница — один запрос LIMIT per_page + 1 от позиции курсора,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+
+    keyset = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'pk')):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self._has_previous = False
+        self._has_next = False
+
+    @property
+    def num_pages(self):
+        # Номер страницы считается относительно текущего окна:
+        # Page.has_previous() и Page.has_next() работают без COUNT(*).
+        return 1 + self._has_previous + self._has_next
+
+    def _seek(self, direction, pub_date, pk):
+        date_key, id_key = self.keys
+        lookup = 'lt' if direction == FORWARD else 'gt'
+        queryset = self.object_list.filter(
+            Q(**{f'{date_key}__{lookup}': pub_date})
+            | Q(**{date_key: pub_date, f'{id_key}__{lookup}': pk})
+        )
+        if direction == FORWARD:
+            return queryset.order_by(f'-{date_key}', f'-{id_key}')
+        return queryset.order_by(date_key, id_key)
+
+    def _cursor(self, direction, row):
+        date_key, id_key = self.keys
+        return encode_cursor(
+            direction, getattr(row, date_key), getattr(row, id_key),
+        )
+
+    def _fetch(self, position):
+        """До per_page + 1 строк от курсора в порядке обхода."""
+        if position is None:
+            date_key, id_key = self.keys
+            queryset = self.object_list.order_by(f'-{date_key}', f'-{id_key}')
+        else:
+            queryset = self._seek(*position)
+        return list(queryset[:self.per_page + 1])
+
+    def get_page(self, cursor):
+        position = decode_cursor(cursor)
+        direction = FORWARD if position is None else position[0]
+        rows = self._fetch(position)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == BACKWARD:
+            if not has_more:
+                # Дошли до начала ленты: отдаём свежую первую страницу,
+                # чтобы она не оказалась короче per_page.
+                return self.get_page(None)
+            rows.reverse()
+            self._has_previous, self._has_next = True, True
+        else:
+            self._has_previous = position is not None
+            self._has_next = has_more
+        page = Page(rows, 1 + self._has_previous, self)
+        page.next_cursor = (
+            self._cursor(FORWARD, rows[-1]) if self._has_next else None
+        )
+        page.previous_cursor = (
+            self._cursor(BACKWARD, rows[0]) if self._has_previous else None
+        )
+        return page
+
+
+class CachedCountPaginator(Paginator):
+    """Постраничный вывод по номерам страниц без COUNT(*) на каждый запрос.
+
+    С count_scope общее число постов берётся из кеша (см. caching.py).
+    Без него точное число не нужно: наличие следующей страницы
+    определяется запросом LIMIT per_page + 1.
+    """
+
+    keyset = False
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count_scope=None):
+        super().__init__(object_list, per_page)
+        self.count_scope = count_scope
+        self._known_pages = 1
+
+    @property
+    def exact(self):
+        return self.count_scope is not None
+
+    @cached_property
+    def count(self):
+        if not self.exact:
+            return super().count
+        return get_post_count(self.count_scope, self.object_list)
+
+    @property
+    def num_pages(self):
+        if not self.exact:
+            return self._known_pages
+        if self.count == 0 and not self.allow_empty_first_page:
+            return 0
+        return ceil(max(1, self.count - self.orphans) / self.per_page)
+
+    def validate_number(self, number):
+        if self.exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def get_page(self, number):
+        if self.exact:
+            return super().get_page(number)
+        try:
+            return self.page(number)
+        except (PageNotAnInteger, EmptyPage):
+            return self.page(1)
+
+    def page(self, number):
+        if self.exact:
+            page = super().page(number)
+        else:
+            number = self.validate_number(number)
+            bottom = (number - 1) * self.per_page
+            rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+            if not rows and number > 1:
+                raise EmptyPage('That page contains no results')
+            self._known_pages = number + (len(rows) > self.per_page)
+            page = self._get_page(rows[:self.per_page], number, self)
+        page.page_window = self.get_page_window(page.number)
+        return page
+
+    def get_page_window(self, number, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг текущей с многоточиями вместо пропусков."""
+        last = self.num_pages
+        pages = set(range(1, on_ends + 1))
+        pages.update(range(number - on_each_side, number + on_each_side + 1))
+        if self.exact:
+            pages.update(range(last - on_ends + 1, last + 1))
+        window, previous = [], 0
+        for page_number in sorted(p for p in pages if 1 <= p <= last):
+            if page_number - previous > 1:
+                window.append(self.ELLIPSIS)
+            window.append(page_number)
+            previous = page_number
+        return window
+
+
+class EstimatedCountPaginator(Paginator):
+    """Паджинатор списка постов в админке без полного COUNT(*).
+
+    Без фильтров число постов берётся из кеша (см. caching.py),
+    с фильтрами считаются не больше COUNT_LIMIT строк: дальше
+    этой границы админка страниц не показывает.
+    """
+
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return get_post_count('all', queryset)
+        return min(queryset[:self.COUNT_LIMIT].count(), self.COUNT_LIMIT)
+
+
+def get_page_obj(request, obj_list, count_scope=None, transform=None,
+                 paginator_class=CursorPaginator, **kwargs):
+    """Страница ленты.
 
-def get_page_obj(request, obj_list):
+    transform превращает строки страницы в посты, если пагинируется
+    не сам Post (например, записи материализованной ленты).
+    """
     page_number = request.GET.get("page")
-    paginator = Paginator(obj_list, PER_PAGE)
-    page_obj = paginator.get_page(page_number)
+    if page_number is not None:
+        # Старые ссылки вида ?page=N продолжают работать.
+        paginator = CachedCountPaginator(obj_list, PER_PAGE, count_scope)
+        page_obj = paginator.get_page(page_number)
+    else:
+        paginator = paginator_class(obj_list, PER_PAGE, **kwargs)
+        page_obj = paginator.get_page(request.GET.get("cursor"))
+    if transform is not None:
+        page_obj.object_list = transform(page_obj.object_list)
     return page_obj
@@ -0,0 +1,138 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+posts_post_fts хранит копию текста постов; в синхроне её держат
+сигналы (signals.py), команда rebuild_search_index собирает индекс
+заново. Без FTS5 (не SQLite или SQLite без модуля) поиск работает
+через LIKE.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+
+_available = {}
+
+
+def is_available():
+    name = connection.settings_dict['NAME']
+    if name not in _available:
+        _available[name] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _available[name]
+
+
+def build_match(query):
+    """Запрос FTS5 из слов пользователя: все слова, каждое — как префикс.
+
+    Операторы и кавычки FTS5 из ввода не проходят, поэтому синтаксических
+    ошибок в MATCH не бывает.
+    """
+    words = WORD.findall(query)
+    return ' '.join(f'"{word}"*' for word in words) or None
+
+
+def index_post(post):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def unindex_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id],
+        )
+
+
+def rebuild_index():
+    """Заполняет индекс по таблице постов; возвращает число постов."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table}'
+        )
+        count = cursor.rowcount
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+        )
+    return count
+
+
+class SearchResults:
+    """Найденные посты по убыванию релевантности (bm25).
+
+    Срез — один запрос к индексу за id и один за сами посты, поэтому
+    объект годится как object_list для паджинатора.
+    """
+
+    def __init__(self, match, queryset):
+        self.match = match
+        self.queryset = queryset
+
+    def count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        limit = -1 if index.stop is None else max(0, index.stop - start)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank, rowid DESC LIMIT %s OFFSET %s',
+                [self.match, limit, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(query, queryset=None):
+    """Посты, подходящие под запрос, — лучшие первыми."""
+    if queryset is None:
+        queryset = Post.objects.for_feed()
+    match = build_match(query)
+    if match is None:
+        return queryset.none()
+    if not is_available():
+        return queryset.filter(text__icontains=query)
+    return SearchResults(match, queryset)
+
+
+def filter_posts(queryset, query):
+    """Ограничивает queryset найденными постами, сохраняя его порядок."""
+    match = build_match(query)
+    if match is None:
+        return queryset
+    if not is_available():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match],
+    ))
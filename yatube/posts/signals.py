@@ -0,0 +1,173 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import merged_feed, search, timeline
+from .caching import (
+    bump_generations, card_key, invalidate_post_counts, post_page_scopes,
+)
+from .counters import (
+    bump_comments, bump_image, bump_user, bump_versions, recount_images,
+)
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+# Поля автора и группы, которые видны в карточке поста.
+USER_CARD_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_CARD_FIELDS = ('slug',)
+
+
+def card_fields(instance, fields):
+    # Из __dict__, чтобы не догружать отложенные поля.
+    return tuple(instance.__dict__.get(field) for field in fields)
+
+
+@receiver(post_init, sender=Post)
+def remember_loaded_state(sender, instance, **kwargs):
+    # Группа на момент загрузки нужна, чтобы при смене группы
+    # сбросить счётчик и у старой группы.
+    instance._loaded_group_id = instance.group_id
+    # Картинка на момент загрузки: при замене ссылка на старый файл
+    # снимается. Читаем из __dict__, чтобы не догружать отложенное поле.
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    invalidate_post_counts(instance, [instance._loaded_group_id])
+    bump_post_pages(instance, [instance._loaded_group_id])
+    instance._loaded_group_id = instance.group_id
+    update_fields = kwargs.get('update_fields')
+    update_image_refs(instance, update_fields)
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+    if created:
+        bump_user(instance.author_id, posts_count=1)
+        if settings.POSTS_FOLLOW_FEED_ENGINE == 'timeline':
+            timeline.fan_out_post(instance)
+        update_recent_posts(instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    invalidate_post_counts(instance, [instance._loaded_group_id])
+    bump_post_pages(instance, [instance._loaded_group_id])
+    bump_user(instance.author_id, posts_count=-1)
+    search.unindex_post(instance.pk)
+    # Ключ может достаться новому посту, если база повторит id.
+    cache.delete(card_key(instance))
+    image = instance.__dict__.get('image')
+    bump_image(getattr(image, 'name', image), -1)
+    update_recent_posts(instance.author_id)
+
+
+def update_image_refs(post, update_fields=None):
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if 'image' not in post.__dict__:
+        return
+    old, new = post._loaded_image, post.image.name or ''
+    if old is None:
+        # Поле было отложено при загрузке: прежнее имя неизвестно,
+        # ссылки на новый файл считаем по таблице.
+        recount_images([new])
+    elif old != new:
+        bump_image(new, 1)
+        bump_image(old, -1)
+    post._loaded_image = new
+
+
+def bump_post_pages(post, group_ids=()):
+    group_ids = {post.group_id, *group_ids} - {None}
+    group_slugs = Group.objects.filter(
+        pk__in=group_ids,
+    ).values_list('slug', flat=True) if group_ids else ()
+    bump_generations(post_page_scopes(post, group_slugs))
+
+
+def update_recent_posts(author_id):
+    if settings.POSTS_FOLLOW_FEED_ENGINE == 'merge':
+        merged_feed.refresh_recent(author_id)
+    else:
+        merged_feed.forget_recent(author_id)
+
+
+@receiver(post_init, sender=User)
+def remember_user_card_fields(sender, instance, **kwargs):
+    instance._loaded_card_fields = card_fields(instance, USER_CARD_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    old = instance._loaded_card_fields
+    instance._loaded_card_fields = card_fields(instance, USER_CARD_FIELDS)
+    if created or old == instance._loaded_card_fields:
+        return
+    # Имя автора в карточках его постов и на страницах с ними.
+    if bump_versions(Post.objects.filter(author=instance)):
+        group_slugs = Group.objects.filter(
+            posts__author=instance,
+        ).values_list('slug', flat=True).distinct()
+        bump_generations({
+            'global', f'author:{old[0]}', f'author:{instance.username}',
+            *(f'group:{slug}' for slug in group_slugs),
+        })
+
+
+@receiver(post_init, sender=Group)
+def remember_group_card_fields(sender, instance, **kwargs):
+    instance._loaded_card_fields = card_fields(instance, GROUP_CARD_FIELDS)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    old = instance._loaded_card_fields
+    instance._loaded_card_fields = card_fields(instance, GROUP_CARD_FIELDS)
+    if created or old == instance._loaded_card_fields:
+        return
+    # Ссылка на группу в карточках её постов.
+    if bump_versions(instance.posts.all()):
+        author_names = User.objects.filter(
+            posts__group=instance,
+        ).values_list('username', flat=True).distinct()
+        bump_generations({
+            'global', f'group:{old[0]}', f'group:{instance.slug}',
+            *(f'author:{username}' for username in author_names),
+        })
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        bump_comments(instance.post_id, 1)
+        bump_post_pages(instance.post)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump_comments(instance.post_id, -1)
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        bump_post_pages(post)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    bump_user(instance.user_id, following_count=1)
+    bump_user(instance.author_id, followers_count=1)
+    if (settings.POSTS_FOLLOW_FEED_ENGINE == 'timeline'
+            and instance.user_id and instance.author_id):
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump_user(instance.user_id, following_count=-1)
+    bump_user(instance.author_id, followers_count=-1)
+    if settings.POSTS_FOLLOW_FEED_ENGINE == 'timeline':
+        timeline.prune(instance.user_id, instance.author_id)
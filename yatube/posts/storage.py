@@ -0,0 +1,67 @@
+"""Хранилище картинок постов с именами по содержимому.
+
+Одинаковые байты получают одно имя posts/ab/abcd….jpg и лежат
+на диске один раз: повторная загрузка файл не пишет, а миниатюры
+sorl (их имена зависят от имени исходника) тоже создаются один раз.
+Сколько постов ссылается на файл, хранит ImageBlob; файлы без
+ссылок удаляет команда gc_media.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Свежая отметка времени защищает файл от gc_media, пока
+            # новый пост с этой картинкой ещё не сохранён.
+            os.utime(self.path(name))
+            return name
+        return self._save(name, content)
+
+    @staticmethod
+    def content_name(name, content):
+        """Имя файла по sha256 содержимого в каталоге исходного имени."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Пишем во временный файл рядом и атомарно подменяем: две
+        # одновременные загрузки одних и тех же байт не мешают друг другу.
+        descriptor, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    temp_file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+
+post_image_storage = ContentAddressedStorage()
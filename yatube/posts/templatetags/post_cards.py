@@ -0,0 +1,46 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from core.templatetags.shared_cache import PUNCHING, fill_holes
+
+from ..caching import card_key
+from ..thumbnails import prefetch_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, template_name='includes/post_card.html'):
+    """Карточки постов страницы из кеша.
+
+    Usage::
+
+        {% post_cards page_obj as cards %}
+
+    Все ключи читаются одним get_many, промахи рендерятся и
+    сохраняются одним set_many; метаданные их миниатюр тоже
+    читаются разом. Персональные куски карточки
+    ({% personal %}) в кеш попадают маркерами.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {
+        key: post for key, post in zip(keys, posts) if key not in cards
+    }
+    card_template = context.template.engine.get_template(template_name)
+    with prefetch_thumbnails(missing.values()):
+        with context.push(**{PUNCHING: True}):
+            for key, post in missing.items():
+                with context.push(post=post):
+                    missing[key] = card_template.render(context)
+    if missing:
+        cache.set_many(missing, settings.POSTS_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    rendered = [cards[key] for key in keys]
+    if not context.get(PUNCHING):
+        # Вне {% sharedcache %} маркеры заполняем сразу.
+        rendered = [fill_holes(card, context) for card in rendered]
+    return [mark_safe(card) for card in rendered]
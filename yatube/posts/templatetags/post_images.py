@@ -0,0 +1,41 @@
+from django import template
+from django.conf import settings
+from sorl.thumbnail import default
+from sorl.thumbnail.images import DummyImageFile
+
+from ..thumbnails import thumbnail_specs
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(post):
+    """<picture> со srcset всех готовых вариантов картинки поста.
+
+    Usage::
+
+        {% post_picture post %}
+
+    Пока базовый вариант не готов, выводится заглушка.
+    """
+    srcsets = {}
+    image = None
+    for width, format_, geometry, options in thumbnail_specs(
+        post.image_width,
+    ):
+        thumbnail = default.backend.get_thumbnail(
+            post.image, geometry, **options,
+        )
+        if isinstance(thumbnail, DummyImageFile):
+            continue
+        srcsets.setdefault(format_, []).append(f'{thumbnail.url} {width}w')
+        if format_ == 'JPEG' and width == settings.POSTS_IMAGE_BASE_WIDTH:
+            image = thumbnail
+    return {
+        'post': post,
+        'image': image,
+        'srcset': ', '.join(srcsets.get('JPEG', ())),
+        'webp_srcset': ', '.join(srcsets.get('WEBP', ())),
+        'sizes': settings.POSTS_IMAGE_SIZES,
+        'aspect': '{} / {}'.format(*settings.POSTS_IMAGE_ASPECT),
+    }
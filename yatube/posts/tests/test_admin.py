@@ -0,0 +1,103 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..admin import ChangeListQuerySet
+from ..models import Group, Post
+from ..paginator import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        cls.groups = Group.objects.bulk_create(
+            Group(title=f'Группа {number}', slug=f'group-{number}',
+                  description='Описание')
+            for number in range(3)
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def create_posts(self, count):
+        Post.objects.bulk_create(
+            Post(
+                text=f'Пост {number}',
+                author=self.authors[number % 3],
+                group=Group.objects.get(slug=f'group-{number % 3}'),
+            )
+            for number in range(count)
+        )
+
+    def changelist_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), params,
+            )
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.create_posts(3)
+        few = self.changelist_queries()
+        self.create_posts(30)
+        cache.clear()
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_date_hierarchy_matches_distinct_dates(self):
+        self.create_posts(6)
+        moments = [
+            datetime.datetime(2020, 1, 31, 23, 30),
+            datetime.datetime(2020, 1, 1, 0, 10),
+            datetime.datetime(2020, 2, 29, 12),
+            datetime.datetime(2021, 12, 31, 22),
+            datetime.datetime(2021, 12, 31, 23, 59),
+            datetime.datetime(2023, 6, 1, 8),
+        ]
+        for post, moment in zip(Post.objects.order_by('pk'), moments):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.make_aware(moment),
+            )
+        fast = ChangeListQuerySet(Post)
+        for kind in ('year', 'month', 'day'):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    fast.dates('pub_date', kind),
+                    list(Post.objects.dates('pub_date', kind)),
+                )
+        self.assertEqual(
+            fast.filter(pub_date__year=2020).dates('pub_date', 'month'),
+            [datetime.date(2020, 1, 1), datetime.date(2020, 2, 1)],
+        )
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, '?pub_date__year=2021')
+        self.assertNotContains(response, '?pub_date__year=2022')
+
+    def test_estimated_count(self):
+        self.create_posts(5)
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                EstimatedCountPaginator(Post.objects.all(), 2).count, 5,
+            )
+        with mock.patch.object(EstimatedCountPaginator, 'COUNT_LIMIT', 3):
+            paginator = EstimatedCountPaginator(
+                Post.objects.filter(text__startswith='Пост'), 2,
+            )
+            self.assertEqual(paginator.count, 3)
@@ -0,0 +1,190 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import socket
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.cache_backends.resp import RespCache
+from core.cache_backends.resp_server import RespServer
+from core.cache_backends.sqlite import SQLiteCache
+
+from ..models import Post
+
+User = get_user_model()
+
+
+class CacheContractMixin:
+    """Поведение, на которое опираются posts/caching.py и merged_feed.py."""
+
+    def test_set_get_delete(self):
+        self.cache.set('key', {'a': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'a': [1, 2]})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_add_only_if_missing(self):
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+
+    def test_incr_is_atomic_counter(self):
+        self.cache.set('counter', 10, None)
+        self.assertEqual(self.cache.incr('counter'), 11)
+        self.assertEqual(self.cache.decr('counter', 5), 6)
+        self.assertEqual(self.cache.get('counter'), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_ttl_eviction(self):
+        self.cache.set('short', 'value', 0.2)
+        self.cache.set('forever', 'value', None)
+        self.assertTrue(self.cache.has_key('short'))
+        time.sleep(0.3)
+        self.assertFalse(self.cache.has_key('short'))
+        self.assertTrue(self.cache.add('short', 'again'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+        self.cache.set('gone', 'value', 0)
+        self.assertIsNone(self.cache.get('gone'))
+
+    def test_touch(self):
+        self.cache.set('key', 'value', 0.2)
+        self.assertTrue(self.cache.touch('key', None))
+        time.sleep(0.3)
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertFalse(self.cache.touch('missing'))
+
+    def test_many(self):
+        self.cache.set_many({'a': 1, 'b': 'два', 'c': None})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c', 'd']),
+            {'a': 1, 'b': 'два', 'c': None},
+        )
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': None})
+        self.cache.clear()
+        self.assertEqual(self.cache.get_many(['c']), {})
+
+    def test_second_instance_sees_changes(self):
+        # Отдельный экземпляр бэкенда — как кеш другого воркера.
+        other = self.make_cache()
+        self.cache.set('generation', 1, None)
+        other.incr('generation')
+        self.assertEqual(self.cache.get('generation'), 2)
+        other.delete('generation')
+        self.assertIsNone(self.cache.get('generation'))
+
+
+def _incr_many(location, times):
+    worker_cache = SQLiteCache(location, {})
+    for _ in range(times):
+        worker_cache.incr('counter')
+
+
+class SQLiteCacheTest(CacheContractMixin, SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_incr_across_processes(self):
+        self.cache.set('counter', 0, None)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_incr_many, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_cull_evicts_entries_closest_to_expiry(self):
+        cache_ = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        cache_.set('forever', 'value', None)
+        for number in range(20):
+            cache_.set(f'key{number}', number, 100 + number)
+        with mock.patch('core.cache_backends.sqlite.CULL_PROBABILITY', 1):
+            cache_.set('last', 'value', 1000)
+        self.assertIsNone(cache_.get('key0'))
+        self.assertEqual(cache_.get('key19'), 19)
+        self.assertEqual(cache_.get('forever'), 'value')
+
+    def test_key_prefix_separates_databases_in_one_file(self):
+        first = SQLiteCache(self.location, {'KEY_PREFIX': 'yatube-first'})
+        second = SQLiteCache(self.location, {'KEY_PREFIX': 'yatube-second'})
+        first.set('posts:gen:global', 1)
+        self.assertIsNone(second.get('posts:gen:global'))
+        self.assertEqual(first.get('posts:gen:global'), 1)
+
+
+class RespCacheTest(CacheContractMixin, SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = RespServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache = self.make_cache()
+        self.cache.clear()
+
+    def make_cache(self):
+        return RespCache(self.server.url, {})
+
+    def test_reconnects_after_dropped_connection(self):
+        self.cache.set('key', 'value')
+        self.cache._client.sock.shutdown(socket.SHUT_RDWR)
+        with self.assertRaises(OSError):
+            self.cache.get('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+
+class SharedCacheFeedTest(TestCase):
+    """Лента инвалидируется для всех воркеров при общем кеше."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = RespServer().start()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Первый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def test_index_cache_over_resp(self):
+        caches_setting = {'default': {
+            'BACKEND': 'core.cache_backends.resp.RespCache',
+            'LOCATION': self.server.url,
+        }}
+        with override_settings(CACHES=caches_setting):
+            cache.clear()
+            url = reverse('posts:index')
+            client = Client()
+            client.get(url)
+            with self.assertNumQueries(0):
+                client.get(url)
+            Post.objects.create(author=self.user, text='Свежий пост')
+            self.assertContains(client.get(url), 'Свежий пост')
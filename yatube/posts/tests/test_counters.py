@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        self.auth_client = Client()
+        self.auth_client.force_login(self.user)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counter(self):
+        post = Post.objects.create(author=self.author, text='Ещё пост')
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+    def test_comment_counter(self):
+        self.auth_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Комментарий'},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        Comment.objects.all().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_follow_counters(self):
+        url_kwargs = {'username': self.author.username}
+        self.auth_client.get(
+            reverse('posts:profile_follow', kwargs=url_kwargs),
+        )
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        response = self.auth_client.get(
+            reverse('posts:profile', kwargs=url_kwargs),
+        )
+        self.assertContains(response, 'Подписчиков: 1')
+        self.auth_client.get(
+            reverse('posts:profile_unfollow', kwargs=url_kwargs),
+        )
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+    def test_recount_repairs_drift(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        Comment.objects.create(post=self.post, author=self.user, text='Текст')
+        UserStats.objects.update(
+            posts_count=100, followers_count=100, following_count=100,
+        )
+        Post.objects.update(comments_count=100)
+        call_command('recount', stdout=StringIO())
+        author_stats = self.stats(self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_user_with_posts_can_be_deleted(self):
+        writer = User.objects.create_user(username='writer')
+        writer_id = writer.pk
+        Post.objects.create(author=writer, text='Пост')
+        Follow.objects.create(user=writer, author=self.author)
+        writer.delete()
+        # Каскад не должен воскрешать строку счётчиков удалённого.
+        connection.check_constraints()
+        self.assertFalse(UserStats.objects.filter(user_id=writer_id).exists())
+        self.assertEqual(self.stats(self.author).followers_count, 0)
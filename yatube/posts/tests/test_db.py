@@ -0,0 +1,46 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core.db.base import DatabaseWrapper
+
+
+class DatabaseWrapperTest(SimpleTestCase):
+    def make_wrapper(self, **options):
+        return DatabaseWrapper({
+            'NAME': ':memory:', 'OPTIONS': options, 'TIME_ZONE': None,
+            'CONN_MAX_AGE': 0, 'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+        })
+
+    def test_pragmas_applied_to_new_connection(self):
+        wrapper = self.make_wrapper(pragmas={
+            'busy_timeout': 1234, 'temp_store': 'MEMORY',
+        })
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 1234)
+                cursor.execute('PRAGMA temp_store')
+                self.assertEqual(cursor.fetchone()[0], 2)
+        finally:
+            wrapper.close()
+
+    def test_unknown_transaction_mode_rejected(self):
+        wrapper = self.make_wrapper(transaction_mode='LAZY')
+        with self.assertRaises(ImproperlyConfigured):
+            wrapper.get_connection_params()
+
+    def test_pragmas_not_passed_to_sqlite_connect(self):
+        params = self.make_wrapper(
+            pragmas={'busy_timeout': 1}, transaction_mode='immediate',
+        ).get_connection_params()
+        self.assertNotIn('pragmas', params)
+        self.assertNotIn('transaction_mode', params)
+
+
+class ProjectDatabaseTest(TestCase):
+    def test_settings_pragmas_in_effect(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase
+
+from ..management.commands.bench_views import percentile
+from ..models import Comment, Follow, Group, ImageBlob, Post, UserStats
+from ..urls import urlpatterns
+
+User = get_user_model()
+
+
+class SeedLoadTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = self.settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        call_command(
+            'seed_load', '--users=20', '--groups=3', '--posts=200',
+            '--comments=100', '--follows=3', '--images=2',
+            '--image-share=0.5', stdout=StringIO(),
+        )
+
+    def test_rows_and_derived_data(self):
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            200,
+        )
+        self.assertEqual(
+            sum(ImageBlob.objects.values_list('refcount', flat=True)),
+            Post.objects.exclude(image='').count(),
+        )
+
+    def test_authorship_is_skewed(self):
+        counts = list(Post.objects.values('author').annotate(
+            total=Count('pk'),
+        ).order_by('-total').values_list('total', flat=True))
+        self.assertGreater(counts[0], 4 * counts[len(counts) // 2])
+
+    def test_dates_follow_keys(self):
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True,
+        ))
+        self.assertEqual(dates, sorted(dates))
+
+    def test_bench_views_covers_all_urls_and_rolls_back(self):
+        comments = Comment.objects.count()
+        output = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        call_command(
+            'bench_views', '--iterations=2', '--warmup=0',
+            '--memory-iterations=1', f'--output={output}', stdout=StringIO(),
+        )
+        with open(output, encoding='utf-8') as stream:
+            report = json.load(stream)
+        self.assertEqual(
+            set(report['results']),
+            {f'posts:{pattern.name}' for pattern in urlpatterns},
+        )
+        for name, result in report['results'].items():
+            with self.subTest(name=name):
+                self.assertLess(max(result['status']), 400)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertGreater(result['alloc_peak_kb'], 0)
+        self.assertEqual(report['meta']['rows']['posts'], 200)
+        self.assertEqual(Comment.objects.count(), comments)
+
+        out = StringIO()
+        call_command(
+            'bench_views', 'index', '--iterations=1', '--memory-iterations=0',
+            f'--compare={output}', stdout=out,
+        )
+        self.assertIn('изменение', out.getvalue())
+
+
+class PercentileTest(SimpleTestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.95), 7)
@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..merged_feed import MergedFeedPaginator, get_recent
+from ..models import Follow, Post
+
+User = get_user_model()
+
+POSTS_PER_AUTHOR: int = 8
+
+
+@override_settings(POSTS_FOLLOW_FEED_ENGINE='merge')
+class MergedFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+        for i in range(POSTS_PER_AUTHOR):
+            for author in cls.authors:
+                Post.objects.create(author=author, text=f'Пост {i}')
+        Post.objects.create(
+            author=User.objects.create_user(username='stranger'),
+            text='Чужой пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.auth_client = Client()
+        self.auth_client.force_login(self.user)
+
+    def walk_feed(self):
+        url = reverse('posts:follow_index')
+        posts, cursor = [], None
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            page_obj = self.auth_client.get(url, params).context['page_obj']
+            posts.extend(page_obj)
+            cursor = page_obj.next_cursor
+            if cursor is None:
+                return posts, page_obj
+
+    def expected_feed(self):
+        return list(Post.objects.filter(
+            author__following__user=self.user,
+        ).order_by('-pub_date', '-pk'))
+
+    def test_merged_feed_matches_sql(self):
+        posts, _ = self.walk_feed()
+        self.assertEqual(posts, self.expected_feed())
+
+    def test_previous_page_round_trip(self):
+        url = reverse('posts:follow_index')
+        first_page = self.auth_client.get(url).context['page_obj']
+        second_page = self.auth_client.get(
+            url, {'cursor': first_page.next_cursor},
+        ).context['page_obj']
+        back_page = self.auth_client.get(
+            url, {'cursor': second_page.previous_cursor},
+        ).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+
+    @override_settings(POSTS_RECENT_POSTS_LIMIT=3)
+    def test_falls_back_to_sql_below_truncated_lists(self):
+        posts, _ = self.walk_feed()
+        self.assertEqual(posts, self.expected_feed())
+
+    def test_new_post_refreshes_author_list(self):
+        author = self.authors[0]
+        get_recent([author.pk])
+        post = Post.objects.create(author=author, text='Свежий пост')
+        self.assertEqual(get_recent([author.pk])[0][0][1], post.pk)
+
+    @override_settings(POSTS_MERGE_MAX_AUTHORS=2)
+    def test_too_many_authors_uses_sql(self):
+        posts, page_obj = self.walk_feed()
+        self.assertEqual(posts, self.expected_feed())
+        self.assertNotIsInstance(page_obj.paginator, MergedFeedPaginator)
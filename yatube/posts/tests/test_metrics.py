@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import collect_metrics
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(author=cls.user, text='Пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0.5)
+    @mock.patch('core.middleware.random.random', return_value=0.49)
+    def test_server_timing_header_and_log(self, _):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        with self.assertLogs('yatube.metrics', 'INFO') as logs:
+            response = self.client.get(url)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertIn('view=posts:group_list', logs.output[0])
+        self.assertEqual(
+            logs.records[0].metrics['db_queries'], 2,
+        )
+        self.assertGreater(logs.records[0].metrics['template_ms'], 0)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0.5)
+    @mock.patch('core.middleware.random.random', return_value=0.5)
+    def test_unsampled_request_has_no_header(self, _):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_collect_metrics_counts_cache(self):
+        cache.set('present', 1)
+        with collect_metrics() as metrics:
+            cache.get('present')
+            cache.get('absent')
+            cache.get_many(['present', 'absent'])
+            Post.objects.count()
+        self.assertEqual(metrics.cache_hits, 2)
+        self.assertEqual(metrics.cache_misses, 2)
+        self.assertEqual(metrics.db_queries, 1)
+        self.assertIsNone(cache.get('absent', None))
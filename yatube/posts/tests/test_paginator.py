@@ -1,8 +1,13 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from ..caching import get_post_count
 from ..models import Group, Post
+from ..paginator import CachedCountPaginator
 
 FIRST_PAGE_POSTS_COUNT: int = 10
 SECOND_PAGE_POSTS_COUNT: int = 3
@@ -28,6 +33,7 @@ class PaginatorTest(TestCase):
         Post.objects.bulk_create(cls.posts)
 
     def setUp(self):
+        cache.clear()
         self.auth_client = Client()
         self.auth_client.force_login(self.user)
         self.non_auth_client = Client()
@@ -71,3 +77,94 @@ class PaginatorTest(TestCase):
                     len(response.context['page_obj']),
                     SECOND_PAGE_POSTS_COUNT,
                 )
+
+    def test_cursor_pages(self):
+        url = reverse('posts:index')
+        first_page = self.non_auth_client.get(url).context['page_obj']
+        self.assertEqual(len(first_page), FIRST_PAGE_POSTS_COUNT)
+        self.assertIsNone(first_page.previous_cursor)
+        second_page = self.non_auth_client.get(
+            url, {'cursor': first_page.next_cursor},
+        ).context['page_obj']
+        self.assertEqual(len(second_page), SECOND_PAGE_POSTS_COUNT)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertFalse(
+            set(first_page.object_list) & set(second_page.object_list),
+        )
+        back_page = self.non_auth_client.get(
+            url, {'cursor': second_page.previous_cursor},
+        ).context['page_obj']
+        self.assertEqual(back_page.object_list, first_page.object_list)
+
+    def test_cursor_page_costs_same_as_first(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        with CaptureQueriesContext(connection) as first_queries:
+            response = self.non_auth_client.get(url)
+        cursor = response.context['page_obj'].next_cursor
+        with CaptureQueriesContext(connection) as next_queries:
+            self.non_auth_client.get(url, {'cursor': cursor})
+        for queries in first_queries, next_queries:
+            with self.subTest():
+                post_queries = [
+                    query['sql'] for query in queries
+                    if 'FROM "posts_post"' in query['sql']
+                ]
+                self.assertEqual(len(post_queries), 1)
+                self.assertNotIn('COUNT(', post_queries[0])
+                self.assertNotIn('OFFSET', post_queries[0])
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.non_auth_client.get(
+            reverse('posts:index'), {'cursor': 'не-курсор'},
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), FIRST_PAGE_POSTS_COUNT,
+        )
+
+    def test_page_number_uses_cached_count(self):
+        url = reverse('posts:profile', kwargs={'username': self.user.username})
+        self.non_auth_client.get(url, {'page': 2})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.non_auth_client.get(url, {'page': 2})
+        self.assertFalse(
+            [query for query in queries if 'COUNT(' in query['sql']],
+        )
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            FIRST_PAGE_POSTS_COUNT + SECOND_PAGE_POSTS_COUNT,
+        )
+
+    def test_cached_count_invalidated_on_create_and_delete(self):
+        url = reverse('posts:index')
+        paginator = self.non_auth_client.get(
+            url, {'page': 1},
+        ).context['page_obj'].paginator
+        post = Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(
+            get_post_count('all', Post.objects.all()), paginator.count + 1,
+        )
+        post.delete()
+        self.assertEqual(
+            get_post_count('all', Post.objects.all()), paginator.count,
+        )
+
+    def test_count_free_paginator_detects_next_page(self):
+        paginator = CachedCountPaginator(Post.objects.all(), 5)
+        with self.assertNumQueries(1):
+            page = paginator.get_page(2)
+            self.assertTrue(page.has_next())
+            self.assertTrue(page.has_previous())
+        last_page = CachedCountPaginator(Post.objects.all(), 5).get_page(3)
+        self.assertEqual(len(last_page), 3)
+        self.assertFalse(last_page.has_next())
+
+    def test_page_window_is_elided(self):
+        paginator = CachedCountPaginator(Post.objects.all(), 1, 'all')
+        ellipsis = CachedCountPaginator.ELLIPSIS
+        self.assertEqual(
+            paginator.get_page(7).page_window,
+            [1, ellipsis, 5, 6, 7, 8, 9, ellipsis, 13],
+        )
+        self.assertEqual(
+            paginator.get_page(1).page_window, [1, 2, 3, ellipsis, 13],
+        )
@@ -0,0 +1,41 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..management.commands import check_query_plans
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class QueryPlansTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('Все планы запросов в порядке', out.getvalue())
+        # Данные для проверки откатываются.
+        self.assertFalse(Post.objects.exists())
+
+    def test_existing_rows_do_not_clash_with_fixtures(self):
+        for name in ('plan-reader', 'plan-author'):
+            User.objects.create_user(username=name)
+        Group.objects.create(title='План', slug='plan-group')
+        call_command('check_query_plans', stdout=StringIO())
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_full_scan_and_temp_sort_fail(self):
+        for step in ('SCAN posts_post', 'USE TEMP B-TREE FOR ORDER BY'):
+            with self.subTest(step=step), mock.patch.object(
+                check_query_plans.Command, 'explain', return_value=[step],
+            ):
+                with self.assertRaisesMessage(CommandError, 'Плохих'):
+                    call_command('check_query_plans', stdout=StringIO())
+
+    def test_index_scan_is_fine(self):
+        self.assertIsNone(check_query_plans.FULL_SCAN.match(
+            'SCAN posts_post USING INDEX posts_post_pub_date_131c7f8d',
+        ))
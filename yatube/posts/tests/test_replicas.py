@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import (
+    Client, SimpleTestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.db.routers import (
+    PrimaryReplicaRouter, begin_routing, end_routing, use_primary,
+)
+from core.middleware import ReplicaPinningMiddleware
+
+from ..management.commands.sync_replicas import copy_database
+from ..models import Post
+
+User = get_user_model()
+PIN_COOKIE = ReplicaPinningMiddleware.PIN_COOKIE
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class RouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_outside_request_reads_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_request_reads_replica_until_write(self):
+        token = begin_routing()
+        try:
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+            self.assertEqual(self.router.db_for_write(Post), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+        finally:
+            state = end_routing(token)
+        self.assertTrue(state.wrote)
+
+    def test_use_primary_pins_reads(self):
+        token = begin_routing()
+        try:
+            with use_primary():
+                self.assertEqual(
+                    self.router.db_for_read(Post), DEFAULT_DB_ALIAS,
+                )
+        finally:
+            state = end_routing(token)
+        self.assertFalse(state.wrote)
+
+    def test_no_migrations_on_replicas(self):
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaViewsTest(TransactionTestCase):
+    """Реплика — второе соединение к той же тестовой базе."""
+
+    databases = {DEFAULT_DB_ALIAS, 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        connections.databases['replica'] = {
+            **connections.databases[DEFAULT_DB_ALIAS],
+            'OPTIONS': {'pragmas': {'query_only': 1}},
+            'TEST': {'MIRROR': DEFAULT_DB_ALIAS},
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+        del connections._connections.replica
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer')
+        self.author = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+        return response, len(replica)
+
+    def test_anonymous_reads_go_to_replica(self):
+        response, replica_queries = self.get(reverse('posts:index'))
+        self.assertGreater(replica_queries, 0)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_writer_is_pinned_to_primary(self):
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Свежий пост'},
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response, replica_queries = self.get(
+            reverse('posts:profile', args=[self.user.username]),
+        )
+        self.assertContains(response, 'Свежий пост')
+        self.assertEqual(replica_queries, 0)
+
+    def test_expired_pin_reads_replica(self):
+        self.client.cookies[PIN_COOKIE] = str(int(time.time()) - 1)
+        _, replica_queries = self.get(reverse('posts:index'))
+        self.assertGreater(replica_queries, 0)
+
+    def test_follow_reads_primary(self):
+        response, _ = self.get(
+            reverse('posts:profile_follow', args=[self.author.username]),
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        # Сессия и пользователь читаются до представления,
+        # подписки — только из основной базы.
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.client.cookies.pop(PIN_COOKIE)
+            self.client.get(
+                reverse('posts:profile_unfollow', args=[self.author.username]),
+            )
+        self.assertFalse([q for q in replica if 'posts_' in q['sql']])
+
+
+class CopyDatabaseTest(SimpleTestCase):
+    def test_replica_file_gets_primary_rows(self):
+        with tempfile.TemporaryDirectory() as root:
+            source = sqlite3.connect(os.path.join(root, 'primary.sqlite3'))
+            source.execute('PRAGMA journal_mode = WAL')
+            source.execute('CREATE TABLE t (x)')
+            source.execute('INSERT INTO t VALUES (1), (2)')
+            source.commit()
+            target_name = os.path.join(root, 'replica.sqlite3')
+            self.assertGreater(copy_database(source, target_name), 0)
+            source.execute('INSERT INTO t VALUES (3)')
+            source.commit()
+            replica = sqlite3.connect(target_name)
+            self.assertEqual(
+                replica.execute('SELECT count(*) FROM t').fetchone(), (2,),
+            )
+            copy_database(source, target_name)
+            self.assertEqual(
+                replica.execute('SELECT count(*) FROM t').fetchone(), (3,),
+            )
+            replica.close()
+            source.close()
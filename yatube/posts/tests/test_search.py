@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..paginator import PER_PAGE
+from ..search import FTS_TABLE, build_match, is_available, search_posts
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.cat = Post.objects.create(
+            author=cls.user, text='Кошка спит на подоконнике',
+        )
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Кошка, кошка и ещё раз кошка!',
+        )
+        cls.dog = Post.objects.create(
+            author=cls.user, text='Собака гуляет во дворе',
+        )
+
+    def found(self, query):
+        return list(search_posts(query)[:PER_PAGE])
+
+    def test_index_is_used(self):
+        self.assertTrue(is_available())
+
+    def test_build_match_drops_fts_syntax(self):
+        self.assertEqual(build_match('кот OR "пёс" -*'), '"кот"* "OR"* "пёс"*')
+        self.assertIsNone(build_match('  *** '))
+
+    def test_ranked_prefix_search(self):
+        self.assertEqual(self.found('кошк'), [self.cats, self.cat])
+        self.assertEqual(self.found('КОШКА подоконник'), [self.cat])
+        self.assertEqual(self.found('жираф'), [])
+
+    def test_index_follows_edit_and_delete(self):
+        dog = Post.objects.get(pk=self.dog.pk)
+        dog.text = 'Собака и кошка дружат'
+        dog.save()
+        self.assertIn(dog, self.found('кошка'))
+        self.assertEqual(self.found('двор'), [])
+        Post.objects.filter(pk=self.cats.pk).delete()
+        self.assertEqual(set(self.found('кошка')), {self.cat, dog})
+
+    def test_search_view_paginates_with_query(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Кошка номер {number}')
+            for number in range(PER_PAGE)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        url = reverse('posts:search')
+        response = Client().get(url, {'q': 'кошка'})
+        self.assertEqual(len(response.context['page_obj']), PER_PAGE)
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%88%D0%BA%D0%B0'
+                                      '&amp;page=2')
+        response = Client().get(url, {'q': 'кошка', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 2)
+        response = Client().get(url, {'q': 'жираф'})
+        self.assertContains(response, 'ничего не нашлось')
+        self.assertEqual(Client().get(url).status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'},
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [self.dog])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        self.assertEqual(self.found('кошка'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Проиндексировано постов: 3', out.getvalue())
+        self.assertEqual(self.found('кошка'), [self.cats, self.cat])
@@ -0,0 +1,138 @@
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from core import staticfiles
+from core.wsgi import IMMUTABLE, SHORT_LIVED, StaticFilesApplication
+
+CSS = ('body { background: url("../img/dot.png"); }\n' * 200).encode()
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256))
+
+
+def fake_brotli(data):
+    return b'br:' + gzip.compress(data)[:len(data) // 2]
+
+
+class StaticPipelineTest(SimpleTestCase):
+    def setUp(self):
+        source = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        for directory in (source, self.root):
+            self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        os.makedirs(os.path.join(source, 'css'))
+        os.makedirs(os.path.join(source, 'img'))
+        with open(os.path.join(source, 'css', 'site.css'), 'wb') as file_:
+            file_.write(CSS)
+        with open(os.path.join(source, 'img', 'dot.png'), 'wb') as file_:
+            file_.write(PNG)
+        static = self.settings(
+            STATIC_ROOT=self.root,
+            STATICFILES_DIRS=[source],
+            INSTALLED_APPS=['django.contrib.staticfiles'],
+        )
+        static.enable()
+        self.addCleanup(static.disable)
+
+    def collect(self):
+        call_command('collectstatic', interactive=False, stdout=StringIO())
+
+    def read(self, name):
+        with open(os.path.join(self.root, name), 'rb') as file_:
+            return file_.read()
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        with mock.patch.object(
+            staticfiles, 'brotli', SimpleNamespace(compress=fake_brotli),
+        ):
+            self.collect()
+        css = staticfiles_storage.stored_name('css/site.css')
+        png = staticfiles_storage.stored_name('img/dot.png')
+        self.assertRegex(css, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertIn(png.encode(), self.read(css))
+        self.assertEqual(gzip.decompress(self.read(css + '.gz')),
+                         self.read(css))
+        self.assertTrue(self.read(css + '.br').startswith(b'br:'))
+        self.assertTrue(os.path.exists(os.path.join(self.root, png)))
+        self.assertFalse(os.path.exists(os.path.join(self.root, png + '.gz')))
+
+    def test_static_tag_uses_hashed_names(self):
+        self.collect()
+        rendered = Template(
+            '{% load static %}{% static "css/site.css" %} '
+            '{% static "css/missing.css" %}',
+        ).render(Context())
+        self.assertRegex(
+            rendered, r'^/static/css/site\.[0-9a-f]{12}\.css '
+                      r'/static/css/missing\.css$',
+        )
+
+    def request(self, application, path, **environ):
+        environ.setdefault('PATH_INFO', path)
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        body = b''.join(application(environ, start_response))
+        return response['status'], response['headers'], body
+
+    def test_wsgi_serves_compressed_immutable_files(self):
+        self.collect()
+        passed = []
+
+        def django_app(environ, start_response):
+            passed.append(environ['PATH_INFO'])
+            start_response('404 Not Found', [])
+            return [b'django']
+
+        application = StaticFilesApplication(django_app)
+        url = staticfiles_storage.url('css/site.css')
+
+        status, headers, body = self.request(
+            application, url, HTTP_ACCEPT_ENCODING='br, gzip;q=0.8',
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE)
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(headers['Content-Length'], str(len(body)))
+        self.assertEqual(gzip.decompress(body), CSS.replace(
+            b'../img/dot.png',
+            staticfiles_storage.stored_name('img/dot.png')
+            .replace('img/', '../img/').encode(),
+        ))
+
+        status, headers, body = self.request(
+            application, url, HTTP_ACCEPT_ENCODING='gzip;q=0',
+        )
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertTrue(body.startswith(b'body'))
+
+        status, headers, body = self.request(
+            application, url, HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=headers['ETag'][:-1] + '-gzip"',
+        )
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+
+        status, headers, body = self.request(
+            application, '/static/css/site.css', REQUEST_METHOD='HEAD',
+        )
+        self.assertEqual(headers['Cache-Control'], SHORT_LIVED)
+        self.assertEqual(body, b'')
+        self.assertEqual(passed, [])
+
+        self.request(application, '/static/css/nope.css')
+        self.assertEqual(passed, ['/static/css/nope.css'])
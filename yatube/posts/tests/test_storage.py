@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import ImageBlob, Post
+from ..storage import post_image_storage
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF[:-3] + b'\x0B\x00\x3B'
+
+
+def upload(content=SMALL_GIF, name='small.gif'):
+    return SimpleUploadedFile(name, content, content_type='image/gif')
+
+
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='uploader')
+
+    def setUp(self):
+        # У каждого теста свой каталог: файлы переживают откат транзакции.
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = self.settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def refcount(self, name):
+        return ImageBlob.objects.get(name=name).refcount
+
+    def test_name_depends_only_on_content(self):
+        first = post_image_storage.save('posts/a.GIF', ContentFile(SMALL_GIF))
+        second = post_image_storage.save('posts/b.gif', ContentFile(SMALL_GIF))
+        other = post_image_storage.save('posts/a.gif', ContentFile(OTHER_GIF))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
+        with post_image_storage.open(first) as file_:
+            self.assertEqual(file_.read(), SMALL_GIF)
+
+    def test_same_upload_is_stored_once(self):
+        first = Post.objects.create(
+            author=self.user, text='Раз', image=upload(),
+        )
+        second = Post.objects.create(
+            author=self.user, text='Два', image=upload(name='copy.gif'),
+        )
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        directory = os.path.dirname(post_image_storage.path(name))
+        self.assertEqual(os.listdir(directory), [os.path.basename(name)])
+        self.assertEqual(self.refcount(name), 2)
+
+    def test_edit_and_delete_release_references(self):
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=upload(),
+        )
+        old_name = post.image.name
+        post = Post.objects.get(pk=post.pk)
+        post.image = upload(OTHER_GIF)
+        post.save()
+        self.assertEqual(self.refcount(old_name), 0)
+        self.assertEqual(self.refcount(post.image.name), 1)
+        post.delete()
+        self.assertEqual(self.refcount(post.image.name), 0)
+
+    def test_saving_other_fields_keeps_references(self):
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=upload(),
+        )
+        post = Post.objects.get(pk=post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        Post.objects.only('text').get(pk=post.pk).save()
+        self.assertEqual(self.refcount(post.image.name), 1)
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command('gc_media', *args, stdout=out)
+        return out.getvalue()
+
+    def age(self, name, hours=48):
+        past = timezone.now() - timedelta(hours=hours)
+        ImageBlob.objects.filter(name=name).update(updated=past)
+        os.utime(post_image_storage.path(name), (
+            past.timestamp(), past.timestamp(),
+        ))
+
+    def test_gc_removes_only_old_orphans(self):
+        kept = Post.objects.create(
+            author=self.user, text='Остаётся', image=upload(),
+        )
+        orphan = Post.objects.create(
+            author=self.user, text='Удалён', image=upload(OTHER_GIF),
+        )
+        orphan_name = orphan.image.name
+        orphan.delete()
+        self.gc()
+        self.assertTrue(post_image_storage.exists(orphan_name))
+
+        self.age(kept.image.name)
+        self.age(orphan_name)
+        self.gc('--dry-run')
+        self.assertTrue(post_image_storage.exists(orphan_name))
+        self.assertIn('Удалено файлов: 1', self.gc())
+        self.assertFalse(post_image_storage.exists(orphan_name))
+        self.assertFalse(ImageBlob.objects.filter(name=orphan_name).exists())
+        self.assertTrue(post_image_storage.exists(kept.image.name))
+
+    def test_gc_repairs_drifted_counter(self):
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=upload(),
+        )
+        self.age(post.image.name)
+        ImageBlob.objects.filter(name=post.image.name).update(refcount=0)
+        self.assertIn('Удалено файлов: 0', self.gc())
+        self.assertTrue(post_image_storage.exists(post.image.name))
+        self.assertEqual(self.refcount(post.image.name), 1)
+
+    def test_gc_scan_finds_untracked_files(self):
+        name = post_image_storage.save('posts/x.gif', ContentFile(OTHER_GIF))
+        self.age(name)
+        self.assertIn('Удалено файлов: 0', self.gc())
+        self.assertIn('Удалено файлов: 1', self.gc('--scan'))
+        self.assertFalse(post_image_storage.exists(name))
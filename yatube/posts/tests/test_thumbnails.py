@@ -0,0 +1,279 @@
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..images import PLACEHOLDER_SIZE, read_image_metadata
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+PLACEHOLDER = 'aspect-ratio: 960 / 339'
+
+
+def make_png(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile('big.png', buffer.getvalue(), 'image/png')
+
+
+CARD_IMAGE = '<img class="card-img my-2" src='
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails._pending.clear()
+        self.client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_placeholder_until_thumbnail_ready(self):
+        url = reverse('posts:index')
+        with mock.patch.object(thumbnails, '_submit') as submit:
+            response = self.client.get(url)
+            self.assertContains(response, PLACEHOLDER)
+            self.assertNotContains(response, CARD_IMAGE)
+            self.client.get(url)
+        # В TestCase on_commit не выполняется — задача не поставлена.
+        self.assertEqual(thumbnails._pending, set())
+        submit.assert_not_called()
+
+        self.assertTrue(thumbnails.generate_thumbnails(self.post.image.name))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 2)
+        response = self.client.get(url)
+        self.assertNotContains(response, PLACEHOLDER)
+        self.assertContains(response, CARD_IMAGE)
+
+    def test_image_metadata_saved_with_post(self):
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (2, 1),
+        )
+        self.assertTrue(
+            self.post.image_placeholder.startswith('data:image/jpeg;base64,'),
+        )
+        self.post.text = 'Новый текст'
+        self.post.save(update_fields=['text'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_width, 2)
+        self.assertNotEqual(self.post.image_placeholder, '')
+        self.post.image = None
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertIsNone(self.post.image_width)
+        self.assertEqual(self.post.image_placeholder, '')
+
+    def test_card_image_rendered_without_opening_media(self):
+        url = reverse('posts:index')
+        with mock.patch.object(thumbnails, '_submit'):
+            response = self.client.get(url)
+        self.assertContains(response, self.post.image_placeholder)
+        thumbnails.generate_thumbnails(self.post.image.name)
+        with mock.patch(
+            'django.core.files.storage.FileSystemStorage.open',
+            side_effect=AssertionError('media file opened'),
+        ):
+            response = self.client.get(url)
+            self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            )
+        self.assertContains(
+            response, 'width="960" height="339" loading="lazy"',
+        )
+        self.assertContains(response, self.post.image_placeholder)
+
+    def test_post_without_image_has_no_placeholder(self):
+        Post.objects.create(author=self.user, text='Без картинки')
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+        self.assertContains(response, PLACEHOLDER, count=1)
+
+    def test_form_schedules_new_image(self):
+        with mock.patch('posts.forms.schedule_thumbnails') as schedule:
+            self.author_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+                data={
+                    'text': 'Новая картинка',
+                    'image': SimpleUploadedFile(
+                        'other.gif', SMALL_GIF, 'image/gif',
+                    ),
+                },
+            )
+            self.post.refresh_from_db()
+            schedule.assert_called_once_with(self.post.image.name)
+            self.author_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+                data={'text': 'Только текст'},
+            )
+            schedule.assert_called_once()
+
+    def test_rolled_back_schedule_leaves_nothing_pending(self):
+        with mock.patch.object(thumbnails, '_submit') as submit:
+            with self.assertRaises(DatabaseError):
+                with transaction.atomic():
+                    thumbnails.schedule_thumbnails(self.post.image.name)
+                    raise DatabaseError
+        self.assertEqual(thumbnails._pending, set())
+        submit.assert_not_called()
+
+    def test_pending_name_not_submitted_twice(self):
+        thumbnails._pending.add(self.post.image.name)
+        with mock.patch.object(thumbnails, 'get_executor') as get_executor:
+            thumbnails._submit(self.post.image.name)
+        get_executor.assert_not_called()
+
+    @override_settings(POSTS_THUMBNAIL_EXECUTOR='sync')
+    def test_sync_executor_generates_inline(self):
+        thumbnails._submit(self.post.image.name)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, PLACEHOLDER)
+
+    def test_missing_source_is_not_ready(self):
+        with self.assertLogs('sorl.thumbnail', 'ERROR'):
+            self.assertFalse(
+                thumbnails.generate_thumbnails('posts/missing.gif'),
+            )
+
+    @override_settings(POSTS_THUMBNAIL_EXECUTOR='thread')
+    def test_thread_executor(self):
+        with mock.patch.object(thumbnails, '_executor', None):
+            executor = thumbnails.get_executor()
+            self.assertIsInstance(executor, ThreadPoolExecutor)
+            self.assertIs(thumbnails.get_executor(), executor)
+            executor.shutdown()
+
+    def test_page_thumbnails_read_with_one_query(self):
+        names = [self.post.image.name]
+        for number in range(2):
+            post = Post.objects.create(
+                author=self.user,
+                text=f'Ещё пост {number}',
+                image=SimpleUploadedFile(
+                    f'small{number}.gif', SMALL_GIF, 'image/gif',
+                ),
+            )
+            names.append(post.image.name)
+        for name in names:
+            thumbnails.generate_thumbnails(name)
+        # Пустой кеш: метаданные sorl придётся читать из БД.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        kvstore_queries = [
+            query for query in queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertContains(response, CARD_IMAGE, count=3)
+
+
+class ImageMetadataTest(SimpleTestCase):
+    def test_large_png_converted_after_shrinking(self):
+        with mock.patch.object(
+            Image.Image, 'convert', autospec=True,
+            side_effect=Image.Image.convert,
+        ) as convert:
+            width, height, _ = read_image_metadata(make_png(2000, 1000))
+        self.assertEqual((width, height), (2000, 1000))
+        image = convert.call_args[0][0]
+        self.assertLessEqual(max(image.size), PLACEHOLDER_SIZE)
+
+
+class ResponsiveVariantsTest(TestCase):
+    def test_widths_not_larger_than_source(self):
+        self.assertEqual(thumbnails.variant_widths(None), [960])
+        self.assertEqual(thumbnails.variant_widths(2), [960])
+        self.assertEqual(thumbnails.variant_widths(1000), [480, 960])
+        self.assertEqual(thumbnails.variant_widths(3000), [480, 960, 1440])
+
+    def test_webp_only_when_pillow_supports_it(self):
+        with mock.patch.object(thumbnails.features, 'check') as check:
+            check.return_value = False
+            specs = thumbnails.thumbnail_specs(1000)
+            self.assertEqual({spec[1] for spec in specs}, {'JPEG'})
+            check.return_value = True
+            specs = thumbnails.thumbnail_specs(1000)
+        self.assertIn(
+            (480, 'WEBP', '480x170',
+             {'crop': 'center', 'upscale': True, 'format': 'WEBP'}),
+            specs,
+        )
+        self.assertEqual(len(specs), 4)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PictureTemplateTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Большая картинка',
+            image=make_png(1000, 400),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails._pending.clear()
+
+    def test_backfill_command_and_srcset(self):
+        out = StringIO()
+        with mock.patch.object(
+            thumbnails.features, 'check', return_value=False,
+        ):
+            call_command('generate_thumbnails', workers=1, stdout=out)
+            response = Client().get(
+                reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            )
+        self.assertIn('1 из 1', out.getvalue())
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, '480w, ')
+        self.assertContains(response, '960w"')
+        self.assertNotContains(response, 'image/webp')
+        self.assertNotContains(response, '1440w')
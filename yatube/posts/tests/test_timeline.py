@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+from ..timeline import timeline_posts
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other_author = User.objects.create_user(username='other')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост',
+        )
+        Post.objects.create(author=cls.other_author, text='Чужой пост')
+
+    def setUp(self):
+        self.auth_client = Client()
+        self.auth_client.force_login(self.user)
+
+    def follow_page(self):
+        response = self.auth_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        self.auth_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author},
+        ))
+        self.assertEqual(self.follow_page(), [self.old_post])
+        self.auth_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author},
+        ))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+        self.assertEqual(self.follow_page(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists(),
+        )
+        self.assertEqual(self.follow_page(), [post, self.old_post])
+
+    def test_engines_return_same_feed(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(author=self.author, text='Новый пост')
+        timeline_feed = self.follow_page()
+        with override_settings(POSTS_FOLLOW_FEED_ENGINE='sql'):
+            self.assertEqual(self.follow_page(), timeline_feed)
+
+    def test_rebuild_command(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.follow_page(), [self.old_post])
+
+    def test_post_deleted_after_entries_read_is_skipped(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        entries = list(TimelineEntry.objects.filter(user=self.user))
+        Post.objects.filter(pk=post.pk).delete()
+        self.assertEqual(timeline_posts(entries), [self.old_post])
@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Старый пост',
+        )
+        Post.objects.filter(pk=cls.post.pk).update(
+            pub_date=timezone.now() - timedelta(days=30),
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def export(self, name='dump.jsonl.gz'):
+        path = os.path.join(self.root, name)
+        call_command('export_yatube', path, stderr=StringIO())
+        return path
+
+    def test_roundtrip_into_fresh_database(self):
+        path = self.export()
+        post = Post.objects.get()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+        call_command('import_yatube', path, stdout=StringIO())
+
+        author = User.objects.get(username='author')
+        imported = Post.objects.get()
+        self.assertEqual(imported.author, author)
+        self.assertEqual(imported.group.slug, 'group')
+        self.assertEqual(imported.pub_date, post.pub_date)
+        self.assertEqual(imported.comments_count, 1)
+        self.assertEqual(
+            imported.comments.get().author.username, 'reader',
+        )
+        self.assertTrue(Follow.objects.filter(
+            user__username='reader', author=author,
+        ).exists())
+        self.assertEqual(UserStats.objects.get(user=author).posts_count, 1)
+        self.assertEqual(TimelineEntry.objects.get().post, imported)
+
+    def test_existing_users_and_groups_are_reused(self):
+        path = self.export()
+        call_command('import_yatube', path, stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(self.author.posts.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            set(Post.objects.values_list('comments_count', flat=True)), {1},
+        )
+
+    def test_plain_jsonl(self):
+        path = self.export('dump.jsonl')
+        with open(path, encoding='utf-8') as stream:
+            rows = [json.loads(line) for line in stream]
+        self.assertEqual(
+            [row['model'] for row in rows],
+            ['auth.user', 'auth.user', 'posts.group', 'posts.post',
+             'posts.comment', 'posts.follow'],
+        )
+        self.assertEqual(rows[3]['fields']['author'], self.author.pk)
+
+    def test_models_out_of_order_rejected(self):
+        path = os.path.join(self.root, 'bad.jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            for label in ('posts.group', 'auth.user'):
+                stream.write(json.dumps(
+                    {'model': label, 'pk': 1, 'fields': {}},
+                ) + '\n')
+        with self.assertRaisesMessage(CommandError, 'Строка 2'):
+            call_command('import_yatube', path, stdout=StringIO())
@@ -0,0 +1,215 @@
+import shutil
+import struct
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from ..forms import PostForm
+from ..models import Post
+from ..uploads import (
+    ExifStripper, RejectedUpload, StreamingImageUploadHandler,
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+ORIENTATION, MAKE, GPS_IFD = 0x0112, 0x010F, 0x8825
+
+
+def make_jpeg(size=(64, 48), exif=True):
+    image = Image.new('RGB', size, (10, 120, 200))
+    buffer = BytesIO()
+    if exif:
+        tags = Image.Exif()
+        tags[ORIENTATION] = 6
+        tags[MAKE] = 'Secret Camera'
+        image.save(buffer, 'JPEG', exif=tags.tobytes())
+    else:
+        image.save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def make_png():
+    image = Image.new('RGB', (8, 6), (10, 120, 200))
+    info = PngInfo()
+    info.add_text('Author', 'Secret Author')
+    info.add_itxt('Comment', 'Secret Comment')
+    tags = Image.Exif()
+    tags[MAKE] = 'Secret Camera'
+    buffer = BytesIO()
+    image.save(buffer, 'PNG', pnginfo=info, exif=tags.tobytes())
+    return buffer.getvalue()
+
+
+def riff_chunk(name, data):
+    return name + struct.pack('<I', len(data)) + data + b'\x00' * (
+        len(data) & 1
+    )
+
+
+def make_webp():
+    chunks = (
+        riff_chunk(b'VP8X', b'\x0c' + b'\x00' * 9)
+        + riff_chunk(b'VP8L', b'\x2f' + b'\x00' * 8)
+        + riff_chunk(b'EXIF', b'Secret Camera')
+        + riff_chunk(b'XMP ', b'<x>Secret Place</x>')
+    )
+    return b'RIFF' + struct.pack('<I', len(chunks) + 4) + b'WEBP' + chunks
+
+
+class ExifStripperTest(TestCase):
+    def test_strips_exif_but_keeps_orientation(self):
+        stripped = ExifStripper().feed(make_jpeg())
+        self.assertNotIn(b'Secret Camera', stripped)
+        with Image.open(BytesIO(stripped)) as image:
+            self.assertEqual(dict(image.getexif()), {ORIENTATION: 6})
+            image.load()
+
+    def test_result_does_not_depend_on_chunking(self):
+        data = make_jpeg()
+        whole = ExifStripper().feed(data)
+        stripper = ExifStripper()
+        by_byte = b''.join(
+            stripper.feed(data[index:index + 1])
+            for index in range(len(data))
+        ) + stripper.flush()
+        self.assertEqual(by_byte, whole)
+
+    def test_other_formats_pass_through(self):
+        data = b'GIF89a' + b'x' * 100
+        stripper = ExifStripper()
+        self.assertEqual(
+            stripper.feed(data[:3]) + stripper.feed(data[3:]), data,
+        )
+
+    def strip_by_byte(self, data):
+        stripper = ExifStripper()
+        return b''.join(
+            stripper.feed(data[index:index + 1])
+            for index in range(len(data))
+        ) + stripper.flush()
+
+    def test_png_metadata_chunks_removed(self):
+        data = make_png()
+        stripped = ExifStripper().feed(data)
+        self.assertEqual(self.strip_by_byte(data), stripped)
+        for secret in (b'Secret Author', b'Secret Comment', b'Secret Camera'):
+            self.assertIn(secret, data)
+            self.assertNotIn(secret, stripped)
+        with Image.open(BytesIO(stripped)) as image:
+            image.load()
+            self.assertEqual(image.size, (8, 6))
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_webp_metadata_chunks_blanked(self):
+        data = make_webp()
+        stripped = ExifStripper().feed(data)
+        self.assertEqual(self.strip_by_byte(data), stripped)
+        # Размер в заголовке RIFF остаётся верным.
+        self.assertEqual(len(stripped), len(data))
+        self.assertNotIn(b'Secret', stripped)
+        self.assertNotIn(b'EXIF', stripped)
+        self.assertEqual(stripped.count(b'JUNK'), 2)
+        self.assertEqual(stripped[20], 0)
+        self.assertIn(riff_chunk(b'VP8L', b'\x2f' + b'\x00' * 8), stripped)
+
+
+class UploadHandlerTest(TestCase):
+    def receive(self, data, chunk_size=1024):
+        handler = StreamingImageUploadHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', len(data))
+        chunks = 0
+        for start in range(0, len(data), chunk_size):
+            handler.receive_data_chunk(data[start:start + chunk_size], start)
+            chunks += 1
+            if handler.error:
+                break
+        return handler, chunks, handler.file_complete(len(data))
+
+    @override_settings(POSTS_UPLOAD_MAX_BYTES=5000)
+    def test_byte_cap(self):
+        handler, _, uploaded = self.receive(b'\xff\xd8' + b'\x00' * 10000)
+        self.assertIsInstance(uploaded, RejectedUpload)
+        self.assertIn('Файл больше', uploaded.upload_error)
+
+    @override_settings(POSTS_UPLOAD_MAX_PIXELS=1000)
+    def test_pixel_cap_checked_from_header(self):
+        data = make_jpeg(size=(2000, 2000), exif=False)
+        _, chunks, uploaded = self.receive(data)
+        self.assertIsInstance(uploaded, RejectedUpload)
+        self.assertIn('Мпикс', uploaded.upload_error)
+        # Отказ — по заголовку, файл целиком не читался.
+        self.assertEqual(chunks, 1)
+
+    def test_accepted_file_is_on_disk_without_exif(self):
+        data = make_jpeg()
+        _, _, uploaded = self.receive(data, chunk_size=100)
+        self.assertTrue(hasattr(uploaded, 'temporary_file_path'))
+        self.assertLess(uploaded.size, len(data))
+        self.assertNotIn(b'Secret Camera', uploaded.read())
+        uploaded.close()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_post_create_accepts_image(self):
+        response = self.client.post(reverse('posts:post_create'), data={
+            'text': 'С картинкой',
+            'image': SimpleUploadedFile('photo.jpg', make_jpeg()),
+        })
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get(text='С картинкой')
+        self.assertEqual((post.image_width, post.image_height), (64, 48))
+        with post.image.open() as stored:
+            self.assertNotIn(b'Secret Camera', stored.read())
+
+    @override_settings(POSTS_UPLOAD_MAX_PIXELS=1000)
+    def test_post_edit_rejects_large_image(self):
+        post = Post.objects.create(author=self.user, text='Пост')
+        response = self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={
+                'text': 'Пост',
+                'image': SimpleUploadedFile(
+                    'big.jpg', make_jpeg(size=(200, 200)),
+                ),
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 0.001 Мпикс.',
+        )
+        post.refresh_from_db()
+        self.assertFalse(post.image)
+
+    @override_settings(POSTS_UPLOAD_MAX_BYTES=100)
+    def test_form_checks_files_not_seen_by_handler(self):
+        form = PostForm(
+            data={'text': 'Пост'},
+            files={'image': SimpleUploadedFile('photo.jpg', make_jpeg())},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('Файл больше', form.errors['image'][0])
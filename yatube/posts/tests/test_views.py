@@ -1,15 +1,19 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from ..caching import card_key
+from ..models import Comment, Follow, Group, Post
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
@@ -289,3 +293,262 @@ class ViewTest(TestCase):
             ).exists(),
         )
         self.assertEqual(Follow.objects.count(), follow_count - 1)
+
+
+class FeedQueriesTest(TestCase):
+    """Число запросов страницы ленты не зависит от числа карточек."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия',
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(12):
+            Post.objects.create(
+                author=cls.author,
+                text=f'Тестовый пост {i}',
+                group=cls.group,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.auth_client = Client()
+        self.auth_client.force_login(self.user)
+        self.non_auth_client = Client()
+
+    def test_feed_query_counts(self):
+        cases = [
+            (self.non_auth_client, reverse('posts:index'), 1),
+            (
+                self.non_auth_client,
+                reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+                2,
+            ),
+            (
+                self.non_auth_client,
+                reverse(
+                    'posts:profile',
+                    kwargs={'username': self.author.username},
+                ),
+                2,
+            ),
+            (self.auth_client, reverse('posts:follow_index'), 4),
+        ]
+        for client, url, queries in cases:
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    response = client.get(url)
+                self.assertContains(response, 'Имя Фамилия')
+
+    def test_feed_query_counts_with_page_numbers(self):
+        url = reverse(
+            'posts:profile', kwargs={'username': self.author.username},
+        )
+        with self.assertNumQueries(3):
+            self.non_auth_client.get(url, {'page': 2})
+        with self.assertNumQueries(1):
+            self.non_auth_client.get(url, {'page': 2})
+
+    def test_post_detail_queries_do_not_grow_with_comments(self):
+        post = Post.objects.filter(author=self.author).first()
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        counts = []
+        for i in range(1, 4):
+            commenter = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(post=post, author=commenter, text='Ок')
+            with CaptureQueriesContext(connection) as queries:
+                self.non_auth_client.get(url)
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, counts)
+
+
+class FeedCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Первый пост', group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_new_post_visible_without_cache_clear(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        Post.objects.create(author=self.user, text='Свежий пост')
+        self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_edit_invalidates_only_affected_scopes(self):
+        group_url = reverse('posts:group_list', kwargs={'slug': 'test_slug'})
+        other_url = reverse('posts:group_list', kwargs={'slug': 'other_slug'})
+        self.client.get(group_url)
+        self.client.get(other_url)
+        Post.objects.create(author=self.user, text='Чужая группа')
+        with self.assertNumQueries(1):
+            self.client.get(group_url)
+        self.post.text = 'Отредактированный пост'
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertNotContains(
+            self.client.get(group_url), 'Отредактированный пост',
+        )
+        self.assertContains(
+            self.client.get(other_url), 'Отредактированный пост',
+        )
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': self.user.username},
+        )
+        self.assertContains(
+            self.client.get(profile_url), 'Отредактированный пост',
+        )
+
+    def test_shared_cache_between_anonymous_and_users(self):
+        url = reverse('posts:index')
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        follow_url = reverse('posts:follow_index')
+        response = self.client.get(url)
+        self.assertNotContains(response, edit_url)
+        self.assertNotContains(response, follow_url)
+        author_client = Client()
+        author_client.force_login(self.user)
+        # Сессия и пользователь — запросов к ленте нет.
+        with self.assertNumQueries(2):
+            response = author_client.get(url)
+        self.assertContains(response, edit_url)
+        self.assertContains(response, follow_url)
+        self.assertNotContains(self.client.get(url), edit_url)
+
+    def test_hole_marker_in_post_text_is_escaped(self):
+        Post.objects.create(
+            author=self.user,
+            text='<!--hole:WyJpbmNsdWRlcy9oZWFkZXIuaHRtbCIsIHt9XQ-->',
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '&lt;!--hole:')
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(author=cls.user, text='Первый пост')
+        cls.other_post = Post.objects.create(
+            author=cls.user, text='Второй пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def test_cards_fetched_with_one_get_many(self):
+        url = reverse('posts:index')
+        with mock.patch(
+            'posts.templatetags.post_cards.cache', wraps=cache,
+        ) as card_cache:
+            self.client.get(url)
+            Post.objects.create(author=self.user, text='Третий пост')
+            response = self.client.get(url)
+        self.assertEqual(card_cache.get_many.call_count, 2)
+        self.assertEqual(card_cache.set_many.call_count, 2)
+        # Во второй раз отрендерена только карточка нового поста.
+        self.assertEqual(len(card_cache.set_many.call_args[0][0]), 1)
+        self.assertContains(response, 'Третий пост')
+
+    def test_edit_invalidates_only_its_card(self):
+        self.client.get(reverse('posts:index'))
+        other_key = card_key(self.other_post)
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Отредактированный пост', 'group': self.group.pk},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 2)
+        self.assertIsNone(cache.get(card_key(self.post)))
+        self.assertIsNotNone(cache.get(other_key))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Отредактированный пост')
+        self.assertContains(response, 'Все записи группы')
+
+    def test_comment_changes_card_version(self):
+        self.author_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Комментарий'},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 2)
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Комментариев: 1',
+        )
+
+    def test_concurrent_edits_get_different_versions(self):
+        first = Post.objects.get(pk=self.post.pk)
+        second = Post.objects.get(pk=self.post.pk)
+        first.text = 'Первая правка'
+        first.save()
+        second.text = 'Вторая правка'
+        second.save()
+        self.assertEqual((first.version, second.version), (2, 3))
+
+    def test_author_rename_changes_card(self):
+        self.client.get(reverse('posts:index'))
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Новое'
+        author.save()
+        self.assertContains(self.client.get(reverse('posts:index')), 'Новое')
+        author.save(update_fields=['last_login'])
+        self.assertEqual(Post.objects.get(pk=self.post.pk).version, 2)
+
+    def test_deleted_post_card_dropped(self):
+        self.client.get(reverse('posts:index'))
+        post = Post.objects.get(pk=self.other_post.pk)
+        key = card_key(post)
+        self.assertIsNotNone(cache.get(key))
+        post.delete()
+        self.assertIsNone(cache.get(key))
+
+    def test_personal_links_not_cached_in_card(self):
+        # Лента подписок не в {% sharedcache %}: маркеры заполняет сам тег.
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        reader_client = Client()
+        reader_client.force_login(reader)
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk},
+        )
+        self.author_client.get(reverse('posts:index'))
+        response = reader_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, '<!--hole:')
+        self.assertNotContains(response, edit_url)
+        self.assertContains(response, detail_url)
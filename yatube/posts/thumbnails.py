@@ -0,0 +1,271 @@
+"""Миниатюры картинок постов генерируются в фоне, а не в запросе.
+
+Для каждой картинки создаются варианты нескольких ширин
+(POSTS_IMAGE_WIDTHS) в JPEG и, если Pillow умеет, в WebP —
+шаблон собирает из них <picture> со srcset.
+
+DeferredThumbnailBackend отдаёт миниатюру, только если она уже есть
+в key-value store sorl; иначе ставит генерацию в пул и возвращает
+DummyImageFile — шаблон показывает заглушку из {% empty %}.
+Когда все размеры готовы, версия поста растёт и карточка
+перерисовывается уже с картинкой.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import (
+    DummyImageFile, ImageFile, deserialize_image_file,
+)
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+# Внутри фоновой задачи миниатюры создаются как обычно.
+_generating = ContextVar('thumbnail_generating', default=False)
+# Метаданные миниатюр страницы, прочитанные prefetch_thumbnails().
+_prefetched = ContextVar('thumbnail_prefetched', default=None)
+_pending = set()
+_lock = threading.Lock()
+_executor = None
+
+
+def variant_formats():
+    """Форматы вариантов: WebP — только если Pillow собран с ним."""
+    return ('JPEG', 'WEBP') if features.check('webp') else ('JPEG',)
+
+
+def variant_widths(image_width=None):
+    """Ширины вариантов без увеличения исходника.
+
+    Базовая ширина есть всегда: её карточка показывала и раньше.
+    """
+    base = settings.POSTS_IMAGE_BASE_WIDTH
+    return sorted({base, *(
+        width for width in settings.POSTS_IMAGE_WIDTHS
+        if image_width and width <= image_width
+    )})
+
+
+def thumbnail_specs(image_width=None):
+    """(ширина, формат, геометрия sorl, опции) всех вариантов картинки."""
+    aspect_width, aspect_height = settings.POSTS_IMAGE_ASPECT
+    specs = []
+    for width in variant_widths(image_width):
+        geometry = f'{width}x{round(width * aspect_height / aspect_width)}'
+        for format_ in variant_formats():
+            options = {'crop': 'center', 'upscale': True}
+            if format_ != 'JPEG':
+                options['format'] = format_
+            specs.append((width, format_, geometry, options))
+    return specs
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if _generating.get() or not file_:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        source = ImageFile(file_)
+        thumbnail = self.thumbnail_file(source, geometry_string, options)
+        prefetched = _prefetched.get()
+        if prefetched is not None and thumbnail.key in prefetched:
+            cached = prefetched[thumbnail.key]
+        else:
+            cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        schedule_thumbnails(source.name)
+        return DummyImageFile(geometry_string)
+
+    def thumbnail_file(self, source, geometry_string, options):
+        """Файл миниатюры без обращения к хранилищу и kvstore."""
+        return ImageFile(
+            self._get_thumbnail_filename(
+                source, geometry_string, self._full_options(source, options),
+            ),
+            default.storage,
+        )
+
+    def _full_options(self, source, options):
+        # Те же умолчания, что добавляет ThumbnailBackend.get_thumbnail:
+        # от них зависит имя файла миниатюры.
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+
+def _get_many_raw(kvstore, keys):
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    empty = cached_db_kvstore.EMPTY_VALUE
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        rows = dict(KVStoreModel.objects.filter(
+            key__in=missing,
+        ).values_list('key', 'value'))
+        # Как и sorl, запоминаем отсутствие ключа, чтобы не ходить в БД.
+        fetched = {key: rows.get(key, empty) for key in missing}
+        kvstore.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(fetched)
+    return {
+        key: None if value == empty else value
+        for key, value in found.items()
+    }
+
+
+@contextmanager
+def prefetch_thumbnails(posts):
+    """Читает метаданные миниатюр картинок постов одним запросом.
+
+    Внутри блока get_thumbnail() для вариантов из thumbnail_specs()
+    не обращается к kvstore.
+    """
+    backend = default.backend
+    if not isinstance(backend, DeferredThumbnailBackend):
+        yield
+        return
+    keys = {}
+    for post in posts:
+        if not post.image:
+            continue
+        source = ImageFile(post.image)
+        for _, _, geometry, options in thumbnail_specs(post.image_width):
+            thumbnail = backend.thumbnail_file(source, geometry, options)
+            keys[add_prefix(thumbnail.key)] = thumbnail.key
+    raw = _get_many_raw(default.kvstore, list(keys)) if keys else {}
+    prefetched = dict(_prefetched.get() or {})
+    prefetched.update(
+        (keys[key], deserialize_image_file(value) if value else None)
+        for key, value in raw.items()
+    )
+    token = _prefetched.set(prefetched)
+    try:
+        yield
+    finally:
+        _prefetched.reset(token)
+
+
+def generate_thumbnails(name):
+    """Создаёт все варианты картинки из thumbnail_specs().
+
+    Возвращает True, если все миниатюры готовы.
+    """
+    from .models import Post
+
+    image_width = Post.objects.filter(image=name).values_list(
+        'image_width', flat=True,
+    ).first()
+    # Ключи kvstore зависят от хранилища исходника — берём то же,
+    # что у поля, а не default_storage.
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    token = _generating.set(True)
+    try:
+        for _, _, geometry, options in thumbnail_specs(image_width):
+            thumbnail = default.backend.get_thumbnail(
+                source, geometry, **options,
+            )
+            if not default.kvstore.get(thumbnail):
+                # Исходник не открылся — sorl уже записал ошибку в лог.
+                return False
+        _refresh_posts(name)
+        return True
+    except Exception:
+        logger.exception('Thumbnail generation failed for %s', name)
+        return False
+    finally:
+        _generating.reset(token)
+
+
+def _refresh_posts(name):
+    from .signals import bump_post_pages
+    from .models import Post
+
+    posts = list(Post.objects.filter(image=name).select_related('author'))
+    Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+        version=F('version') + 1,
+    )
+    for post in posts:
+        bump_post_pages(post)
+
+
+def schedule_thumbnails(name):
+    """Ставит генерацию в пул после коммита текущей транзакции.
+
+    В _pending имя попадает уже после коммита: при откате колбэк
+    отбрасывается и ничего не остаётся.
+    """
+    transaction.on_commit(lambda: _submit(name))
+
+
+def _submit(name):
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    executor = get_executor()
+    if executor is None:
+        try:
+            generate_thumbnails(name)
+        finally:
+            _pending.discard(name)
+        return
+    future = executor.submit(run_in_worker, name)
+    future.add_done_callback(lambda future: _pending.discard(name))
+
+
+def run_in_worker(name):
+    try:
+        return generate_thumbnails(name)
+    finally:
+        # У потока пула свои соединения с БД — не оставляем их открытыми.
+        connections.close_all()
+
+
+def init_process():
+    # Соединения с БД, унаследованные через fork, принадлежат родителю:
+    # закрывать их нельзя, просто забываем.
+    for connection in connections.all():
+        connection.connection = None
+
+
+def get_executor():
+    """Пул из POSTS_THUMBNAIL_EXECUTOR: thread, process или sync (None)."""
+    global _executor
+    kind = settings.POSTS_THUMBNAIL_EXECUTOR
+    if kind == 'sync':
+        return None
+    with _lock:
+        if _executor is None:
+            workers = settings.POSTS_THUMBNAIL_WORKERS
+            if kind == 'process':
+                _executor = ProcessPoolExecutor(
+                    workers,
+                    mp_context=multiprocessing.get_context('fork'),
+                    initializer=init_process,
+                )
+            else:
+                _executor = ThreadPoolExecutor(
+                    workers, thread_name_prefix='thumbnails',
+                )
+    return _executor
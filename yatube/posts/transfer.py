@@ -0,0 +1,250 @@
+"""Перенос пользователей и постов между базами (export_yatube, import_yatube).
+
+Формат — JSON Lines: строка на объект в виде dumpdata
+({"model": ..., "pk": ..., "fields": {...}}), модели идут в порядке
+MODELS, чтобы при загрузке внешние ключи ссылались на уже
+вставленные строки. Файл с именем на .gz сжимается.
+
+Производные данные (UserStats, comments_count, ImageBlob, поисковый
+индекс, ленты подписок) не выгружаются: import_yatube пересчитывает
+их по загруженным строкам. Файлы картинок переносятся отдельно,
+в файле только их имена.
+"""
+import gzip
+import io
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from . import search, timeline
+from .counters import recount_comments, recount_images, recount_users
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Метка модели в файле → (модель, выгружаемые поля).
+MODELS = {
+    'auth.user': (User, (
+        'username', 'password', 'email', 'first_name', 'last_name',
+        'is_staff', 'is_active', 'is_superuser', 'date_joined', 'last_login',
+    )),
+    'posts.group': (Group, ('title', 'slug', 'description')),
+    'posts.post': (Post, (
+        'text', 'pub_date', 'author', 'group', 'image',
+        'image_width', 'image_height', 'image_placeholder',
+    )),
+    'posts.comment': (Comment, ('post', 'author', 'text', 'created')),
+    'posts.follow': (Follow, ('user', 'author')),
+}
+DATETIME_FIELDS = {'date_joined', 'last_login', 'pub_date', 'created'}
+# Уже существующие в базе пользователи и группы не дублируются.
+NATURAL_KEYS = {'auth.user': 'username', 'posts.group': 'slug'}
+
+
+@contextmanager
+def open_stream(path, mode):
+    """Файл, stdin/stdout для '-' или gzip для *.gz — всегда в тексте."""
+    if path == '-':
+        stream = io.TextIOWrapper(
+            sys.stdin.buffer if mode == 'r' else sys.stdout.buffer,
+            encoding='utf-8',
+        )
+        try:
+            yield stream
+        finally:
+            stream.flush()
+            # Стандартные потоки не закрываем вместе с обёрткой.
+            stream.detach()
+        return
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, mode + 't', encoding='utf-8') as stream:
+        yield stream
+
+
+def dump_row(label, pk, fields):
+    for name, value in fields.items():
+        if isinstance(value, datetime):
+            # Полная точность: DjangoJSONEncoder режет до миллисекунд.
+            fields[name] = value.isoformat()
+    return json.dumps(
+        {'model': label, 'pk': pk, 'fields': fields}, ensure_ascii=False,
+    ) + '\n'
+
+
+def load_row(line):
+    row = json.loads(line)
+    fields = row['fields']
+    for name in DATETIME_FIELDS.intersection(fields):
+        if fields[name] is not None:
+            fields[name] = parse_datetime(fields[name])
+    return row['model'], row['pk'], fields
+
+
+@contextmanager
+def keep_dates():
+    """Отключает auto_now_add: bulk_create иначе ставит текущее время."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def rebuild_derived():
+    """Пересчитывает всё, что bulk_create обошёл мимо сигналов.
+
+    Кеш очищается после коммита: счётчики, страницы и карточки в нём
+    посчитаны до загрузки.
+    """
+    recount_users()
+    recount_comments()
+    recount_images()
+    if search.is_available():
+        search.rebuild_index()
+    if settings.POSTS_FOLLOW_FEED_ENGINE == 'timeline':
+        timeline.rebuild()
+    transaction.on_commit(cache.clear)
+
+
+class Importer:
+    """Пакетная вставка строк файла с переназначением первичных ключей.
+
+    Новый ключ — старый плюс максимальный ключ таблицы до загрузки,
+    поэтому ссылки пересчитываются без таблицы соответствий. В памяти
+    остаются только пользователи и группы, совпавшие с уже
+    существующими по NATURAL_KEYS. Подписки получают новые ключи
+    от базы, повторные пропускаются.
+    """
+
+    def __init__(self, batch_size, on_flush=None):
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.labels = {model: label for label, (model, _) in MODELS.items()}
+        self.offsets = {
+            label: model._default_manager.aggregate(top=Max('pk'))['top'] or 0
+            for label, (model, _) in MODELS.items()
+        }
+        self.existing = {label: {} for label in NATURAL_KEYS}
+        self.order = list(MODELS)
+        self.position = 0
+        self.label = None
+        self.batch = []
+        self.counts = dict.fromkeys(MODELS, 0)
+
+    def add(self, label, pk, fields):
+        if label != self.label:
+            if label not in MODELS:
+                raise ValueError(f'Неизвестная модель: {label}')
+            position = self.order.index(label)
+            if position < self.position:
+                raise ValueError(
+                    f'{label} после {self.label}: модели должны идти '
+                    f'в порядке {", ".join(self.order)}',
+                )
+            self.position = position
+            self.flush()
+            self.label = label
+        self.batch.append((pk, fields))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def remap(self, label, pk):
+        if pk is None:
+            return None
+        existing = self.existing.get(label, {})
+        return existing.get(pk, pk + self.offsets[label])
+
+    def skip_existing(self, label, batch):
+        key = NATURAL_KEYS.get(label)
+        if key is None:
+            return batch
+        model, _ = MODELS[label]
+        found = dict(model._default_manager.filter(**{
+            f'{key}__in': [fields[key] for _, fields in batch],
+        }).values_list(key, 'pk'))
+        for pk, fields in batch:
+            if fields[key] in found:
+                self.existing[label][pk] = found[fields[key]]
+        return [row for row in batch if row[1][key] not in found]
+
+    def build(self, model, label, pk, fields):
+        values = {}
+        for name, value in fields.items():
+            field = model._meta.get_field(name)
+            if field.is_relation:
+                value = self.remap(self.labels[field.related_model], value)
+            values[field.attname] = value
+        if model is not Follow:
+            values['pk'] = self.remap(label, pk)
+        return model(**values)
+
+    def flush(self):
+        if not self.batch:
+            return
+        label, batch, self.batch = self.label, self.batch, []
+        model, _ = MODELS[label]
+        objects = [
+            self.build(model, label, pk, fields)
+            for pk, fields in self.skip_existing(label, batch)
+        ]
+        model._default_manager.bulk_create(
+            objects, ignore_conflicts=model is Follow,
+        )
+        self.counts[label] += len(objects)
+        if self.on_flush is not None:
+            self.on_flush(label, len(batch))
+
+
+class Progress:
+    """Число строк и скорость не чаще раза в interval секунд."""
+
+    def __init__(self, write, interval=1.0):
+        self.write = write
+        self.interval = interval
+        self.started = self.reported = time.monotonic()
+        self.label = None
+        self.rows = self.total = 0
+
+    def step(self, label, rows=1):
+        if label != self.label:
+            self.finish()
+            self.label = label
+            self.label_started = time.monotonic()
+        self.rows += rows
+        self.total += rows
+        now = time.monotonic()
+        if now - self.reported >= self.interval:
+            self.reported = now
+            self.report(now)
+
+    def report(self, now):
+        elapsed = max(now - self.label_started, 1e-9)
+        self.write(
+            f'{self.label}: {self.rows} строк, '
+            f'{self.rows / elapsed:.0f} строк/с'
+        )
+
+    def finish(self):
+        if self.label is not None:
+            self.report(time.monotonic())
+        self.label = None
+        self.rows = 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
@@ -0,0 +1,363 @@
+"""Приём картинок потоком: на диск кусками, с лимитами и без EXIF.
+
+StreamingImageUploadHandler пишет загрузку во временный файл по мере
+чтения запроса, поэтому в памяти держится только текущий кусок.
+Файл больше POSTS_UPLOAD_MAX_BYTES или картинка больше
+POSTS_UPLOAD_MAX_PIXELS отбрасываются сразу, как только это видно:
+размеры берутся из заголовка, до декодирования. По пути вырезаются
+метаданные с геометками и моделью камеры: сегменты APP1 (EXIF и XMP)
+из JPEG, блоки eXIf и текстовые блоки из PNG, блоки EXIF и XMP из
+WebP. Тег ориентации остаётся только у JPEG; в других форматах
+(например, GIF) байты не меняются.
+"""
+import struct
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, UnidentifiedImageError
+
+# Сколько первых байт файла ждать, чтобы прочитать размеры картинки.
+HEADER_BYTES = 256 * 1024
+
+SOI = b'\xff\xd8'
+APP1 = 0xE1
+SOS = 0xDA
+# Маркеры без длины: RSTn, TEM.
+STANDALONE = {0x01, *range(0xD0, 0xD8)}
+ORIENTATION_TAG = 0x0112
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_METADATA = {b'eXIf', b'tEXt', b'zTXt', b'iTXt'}
+WEBP_METADATA = {b'EXIF', b'XMP '}
+# Флаги EXIF и XMP в первом байте блока VP8X.
+VP8X_METADATA_FLAGS = 0x0C
+# Блок WebP с таким именем декодеры пропускают как неизвестный.
+WEBP_BLANK = b'JUNK'
+# Сколько байт нужно, чтобы узнать формат: RIFF....WEBP.
+SNIFF_BYTES = 12
+
+
+def validate_upload(size=None, dimensions=None):
+    """Сообщение об ошибке для слишком большой загрузки или None."""
+    max_bytes = settings.POSTS_UPLOAD_MAX_BYTES
+    if size is not None and size > max_bytes:
+        return f'Файл больше {filesizeformat(max_bytes)}.'
+    if dimensions is not None:
+        width, height = dimensions
+        max_pixels = settings.POSTS_UPLOAD_MAX_PIXELS
+        if width * height > max_pixels:
+            return f'Картинка больше {max_pixels / 1000000:g} Мпикс.'
+    return None
+
+
+def exif_orientation(payload):
+    """Значение тега Orientation из данных сегмента APP1 или None."""
+    if not payload.startswith(b'Exif\x00\x00'):
+        return None
+    tiff = payload[6:]
+    try:
+        order = {b'II': '<', b'MM': '>'}[tiff[:2]]
+        (offset,) = struct.unpack(order + 'I', tiff[4:8])
+        (count,) = struct.unpack(order + 'H', tiff[offset:offset + 2])
+        for index in range(count):
+            start = offset + 2 + index * 12
+            tag, kind, _, value = struct.unpack(
+                order + 'HHIH', tiff[start:start + 10],
+            )
+            if tag == ORIENTATION_TAG and kind == 3:
+                return value
+    except (KeyError, struct.error):
+        return None
+    return None
+
+
+def orientation_segment(orientation):
+    """Минимальный APP1 с единственным тегом Orientation."""
+    tiff = (
+        b'MM\x00\x2a\x00\x00\x00\x08'
+        + struct.pack('>H', 1)
+        + struct.pack('>HHIHH', ORIENTATION_TAG, 3, 1, orientation, 0)
+        + b'\x00\x00\x00\x00'
+    )
+    payload = b'Exif\x00\x00' + tiff
+    return b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+
+
+class JpegFilter:
+    """Фильтр потока JPEG, вырезающий сегменты APP1.
+
+    Буферизуется не больше одного сегмента (до 64 КБ); после начала
+    сжатых данных (SOS) и для не-JPEG байты идут насквозь.
+    """
+
+    def __init__(self):
+        self.buffer = b''
+        self.started = False
+        self.passthrough = False
+
+    def feed(self, data):
+        if self.passthrough:
+            return data
+        self.buffer += data
+        output = []
+        if not self.started:
+            if len(self.buffer) < len(SOI):
+                return b''
+            self.started = True
+            if not self.buffer.startswith(SOI):
+                return self._pass_rest(output)
+            output.append(SOI)
+            self.buffer = self.buffer[len(SOI):]
+        if self._read_segments(output):
+            return self._pass_rest(output)
+        return b''.join(output)
+
+    def _read_segments(self, output):
+        """Переносит целые сегменты в output; True — дальше насквозь."""
+        while len(self.buffer) >= 2:
+            if self.buffer[0] != 0xFF:
+                # Испорченный поток — не трогаем.
+                return True
+            marker = self.buffer[1]
+            if marker == 0xFF:
+                # Байт-заполнитель перед маркером.
+                output.append(self.buffer[:1])
+                self.buffer = self.buffer[1:]
+                continue
+            if marker == SOS:
+                return True
+            if marker in STANDALONE:
+                output.append(self.buffer[:2])
+                self.buffer = self.buffer[2:]
+                continue
+            if len(self.buffer) < 4:
+                break
+            (length,) = struct.unpack('>H', self.buffer[2:4])
+            if len(self.buffer) < 2 + length:
+                break
+            segment = self.buffer[:2 + length]
+            self.buffer = self.buffer[2 + length:]
+            if marker == APP1:
+                orientation = exif_orientation(segment[4:])
+                if orientation and orientation != 1:
+                    output.append(orientation_segment(orientation))
+                continue
+            output.append(segment)
+        return False
+
+    def flush(self):
+        rest, self.buffer = self.buffer, b''
+        return rest
+
+    def _pass_rest(self, output):
+        self.passthrough = True
+        output.append(self.flush())
+        return b''.join(output)
+
+
+class ChunkFilter:
+    """Фильтр потока из сигнатуры и блоков «заголовок, данные».
+
+    Буферизуется только заголовок блока; данные идут насквозь,
+    пропускаются, затираются нулями или правятся в начале (edit)
+    по счётчику байт.
+    """
+
+    signature_size = 0
+    header_size = 8
+
+    def __init__(self):
+        self.buffer = b''
+        self.started = False
+        self.mode = 'copy'
+        self.remaining = 0
+
+    def feed(self, data):
+        self.buffer += data
+        output = []
+        if not self.started:
+            if len(self.buffer) < self.signature_size:
+                return b''
+            self.started = True
+            output.append(self.signature(self.buffer[:self.signature_size]))
+            self.buffer = self.buffer[self.signature_size:]
+        while self.buffer:
+            if self.remaining:
+                part = self.buffer[:self.remaining]
+                self.buffer = self.buffer[len(part):]
+                self.remaining -= len(part)
+                if self.mode == 'copy':
+                    output.append(part)
+                elif self.mode == 'blank':
+                    output.append(bytes(len(part)))
+                elif self.mode == 'edit':
+                    output.append(self.edit(part))
+                    self.mode = 'copy'
+                continue
+            if len(self.buffer) < self.header_size:
+                break
+            header = self.buffer[:self.header_size]
+            self.buffer = self.buffer[self.header_size:]
+            header, self.mode, self.remaining = self.chunk(header)
+            output.append(header)
+        return b''.join(output)
+
+    def flush(self):
+        rest, self.buffer = self.buffer, b''
+        return rest
+
+    def signature(self, data):
+        return data
+
+    def chunk(self, header):
+        """(заголовок на выход, режим данных, длина данных)."""
+        raise NotImplementedError
+
+    def edit(self, data):
+        """Начало данных блока в режиме edit, хотя бы один байт."""
+        return data
+
+
+class PngFilter(ChunkFilter):
+    """Выбрасывает из PNG блоки eXIf, tEXt, zTXt и iTXt целиком."""
+
+    signature_size = len(PNG_SIGNATURE)
+
+    def chunk(self, header):
+        (length,) = struct.unpack('>I', header[:4])
+        # Данные и CRC.
+        if header[4:] in PNG_METADATA:
+            return b'', 'skip', length + 4
+        return header, 'copy', length + 4
+
+
+class WebpFilter(ChunkFilter):
+    """Затирает в WebP блоки EXIF и XMP и снимает их флаги в VP8X.
+
+    Блоки не вырезаются, а переименовываются и заполняются нулями:
+    размер файла записан в заголовке RIFF до них.
+    """
+
+    signature_size = SNIFF_BYTES
+
+    def chunk(self, header):
+        (length,) = struct.unpack('<I', header[4:])
+        # Данные блока выровнены до чётной длины.
+        length += length & 1
+        if header[:4] in WEBP_METADATA:
+            return WEBP_BLANK + header[4:], 'blank', length
+        if header[:4] == b'VP8X' and length:
+            return header, 'edit', length
+        return header, 'copy', length
+
+    def edit(self, data):
+        # Первый байт VP8X — флаги блоков, которых больше нет.
+        return bytes([data[0] & ~VP8X_METADATA_FLAGS]) + data[1:]
+
+
+class ExifStripper:
+    """Фильтр потока картинки, вырезающий метаданные.
+
+    Формат определяется по первым SNIFF_BYTES байтам; дальше поток
+    идёт через JpegFilter, PngFilter, WebpFilter или насквозь.
+    """
+
+    def __init__(self):
+        self.head = b''
+        self.filter = None
+
+    def feed(self, data):
+        if self.filter is None:
+            self.head += data
+            if len(self.head) < SNIFF_BYTES:
+                return b''
+            self.filter = self.choose_filter(self.head)
+            data, self.head = self.head, b''
+        if self.filter is False:
+            return data
+        return self.filter.feed(data)
+
+    def flush(self):
+        if self.filter is None:
+            # Файл короче сигнатуры — отдаём как есть.
+            rest, self.head = self.head, b''
+            return rest
+        if self.filter is False:
+            return b''
+        return self.filter.flush()
+
+    @staticmethod
+    def choose_filter(head):
+        if head.startswith(SOI):
+            return JpegFilter()
+        if head.startswith(PNG_SIGNATURE):
+            return PngFilter()
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            return WebpFilter()
+        return False
+
+
+class RejectedUpload(UploadedFile):
+    """Пустая замена отброшенного файла; причина в upload_error."""
+
+    def __init__(self, name, content_type, error):
+        super().__init__(BytesIO(), name, content_type, 0)
+        self.upload_error = error
+
+
+class StreamingImageUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.stripper = ExifStripper()
+        self.written = 0
+        self.head = b''
+        self.header_checked = False
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error is None:
+            self.error = validate_upload(size=start + len(raw_data))
+        if self.error is None:
+            self._write(self.stripper.feed(raw_data))
+        # Остаток отброшенного файла дочитывается из запроса впустую.
+        return None
+
+    def file_complete(self, file_size):
+        if self.error is None:
+            self._write(self.stripper.flush())
+        if self.error is not None:
+            self.file.close()
+            return RejectedUpload(
+                self.file_name, self.content_type, self.error,
+            )
+        self.file.seek(0)
+        self.file.size = self.written
+        return self.file
+
+    def _write(self, data):
+        if not self.header_checked:
+            self._check_header(data)
+            if self.error is not None:
+                return
+        self.file.write(data)
+        self.written += len(data)
+
+    def _check_header(self, data):
+        self.head += data[:HEADER_BYTES - len(self.head)]
+        try:
+            # Image.open читает только заголовок, пиксели не декодируются.
+            with Image.open(BytesIO(self.head)) as image:
+                dimensions = image.size
+        except Image.DecompressionBombError:
+            dimensions = (settings.POSTS_UPLOAD_MAX_PIXELS + 1, 1)
+        except (UnidentifiedImageError, SyntaxError, OSError):
+            # Заголовок ещё не пришёл целиком или это не картинка:
+            # тогда решит валидация формы.
+            if len(self.head) >= HEADER_BYTES:
+                self.header_checked, self.head = True, b''
+            return
+        self.header_checked, self.head = True, b''
+        self.error = validate_upload(dimensions=dimensions)
@@ -1,22 +1,37 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
 
+from core.db.routers import use_primary
+
+from .caching import feed_cache_context
+from .counters import get_stats
 from .forms import PostForm, CommentForm
+from .merged_feed import MergedFeedPaginator, merge_author_ids
 from .models import Follow, Group, Post
-from .paginator import get_page_obj
+from .paginator import PER_PAGE, CachedCountPaginator, get_page_obj
+from .search import search_posts
+from .timeline import timeline_posts
 
 User = get_user_model()
 
 
-@cache_page(20)
+def lazy_page_obj(*args, **kwargs):
+    # Страница считается только при промахе кеша ленты в шаблоне.
+    return SimpleLazyObject(lambda: get_page_obj(*args, **kwargs))
+
+
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.for_feed()
     template = "posts/index.html"
     context = {
-        "page_obj": get_page_obj(request, post_list),
+        "page_obj": lazy_page_obj(request, post_list, count_scope="all"),
+        **feed_cache_context("global"),
     }
     return render(request, template, context)
 
@@ -24,34 +39,59 @@ def index(request):
 def group_posts(request, slug):
     template = "posts/group_list.html"
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.for_feed()
     context = {
         "group": group,
-        "page_obj": get_page_obj(request, posts),
+        "page_obj": lazy_page_obj(
+            request, posts, count_scope=f"group:{group.pk}",
+        ),
+        **feed_cache_context(f"group:{slug}"),
     }
     return render(request, template, context)
 
 
 def profile(request, username):
     template = "posts/profile.html"
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related("stats"), username=username,
+    )
+    posts = author.posts.for_feed()
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author).exists()
 
     context = {
         "author": author,
-        "page_obj": get_page_obj(request, posts),
+        "page_obj": lazy_page_obj(
+            request, posts, count_scope=f"author:{author.pk}",
+        ),
+        "stats": get_stats(author),
         "following": following,
+        **feed_cache_context(f"author:{username}"),
     }
     return render(request, template, context)
 
 
+def search(request):
+    query = request.GET.get("q", "").strip()
+    results = search_posts(query) if query else Post.objects.none()
+    # Релевантность не даёт ключа для курсора — страницы по номерам,
+    # без COUNT(*) по индексу.
+    paginator = CachedCountPaginator(results, PER_PAGE)
+    context = {
+        "query": query,
+        "page_obj": paginator.get_page(request.GET.get("page", 1)),
+        "page_query": urlencode({"q": query}) + "&" if query else "",
+    }
+    return render(request, "posts/search.html", context)
+
+
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related("author__stats", "group"), id=post_id,
+    )
+    comments = post.comments.select_related("author")
     form = CommentForm()
-    user_posts_count = post.author.posts.all().count()
+    user_posts_count = get_stats(post.author).posts_count
     context = {
         "post": post,
         'comments': comments,
@@ -62,8 +102,10 @@ def post_detail(request, post_id):
 
 
 @login_required
+@use_primary()
+@transaction.atomic
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         author = request.user
         form.instance.author = author
@@ -73,6 +115,8 @@ def post_create(request):
 
 
 @login_required
+@use_primary()
+@transaction.atomic
 def post_edit(request, post_id):
     template = "posts/post_create.html"
     post = get_object_or_404(Post, id=post_id)
@@ -95,6 +139,8 @@ def post_edit(request, post_id):
 
 
 @login_required
+@use_primary()
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -108,13 +154,34 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(
+    engine = settings.POSTS_FOLLOW_FEED_ENGINE
+    posts = Post.objects.for_feed().filter(
         author__following__user=request.user)
-    context = {"page_obj": get_page_obj(request, posts)}
+    author_ids = merge_author_ids(request.user) if engine == "merge" else None
+    if engine == "timeline":
+        entries = request.user.timeline.all()
+        page_obj = get_page_obj(
+            request,
+            entries,
+            keys=("pub_date", "post_id"),
+            transform=timeline_posts,
+        )
+    elif author_ids is not None:
+        page_obj = get_page_obj(
+            request,
+            posts,
+            paginator_class=MergedFeedPaginator,
+            author_ids=author_ids,
+        )
+    else:
+        page_obj = get_page_obj(request, posts)
+    context = {"page_obj": page_obj}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@use_primary()
+@transaction.atomic
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
@@ -127,6 +194,8 @@ def profile_follow(request, username):
 
 
 @login_required
+@use_primary()
+@transaction.atomic
 def profile_unfollow(request, username):
     Follow.objects.filter(
         user=request.user, author__username=username).delete()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import hashlib
 import os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -45,9 +46,12 @@ INSTALLED_APPS = [
     "posts.apps.PostsConfig",  # Управление постами
     "users.apps.UsersConfig",  # Авторизация пользователей
     "about.apps.AboutConfig",  # Страницы About
+    "core",  # Общие шаблонные теги, middleware и метрики
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
+    "core.middleware.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -85,13 +89,56 @@ WSGI_APPLICATION = "yatube.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# core.db — бэкенд SQLite, выполняющий PRAGMA для каждого нового
+# соединения (см. core/db/base.py). WAL: читатели не ждут писателя;
+# synchronous=NORMAL в WAL не теряет целостность, только последние
+# транзакции при отключении питания; cache_size в КиБ, если < 0.
+SQLITE_PRAGMAS = {
+    "busy_timeout": 5000,
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -20000,
+    "temp_store": "MEMORY",
+}
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        "ENGINE": "core.db",
+        # YATUBE_DB_PATH — другой файл базы, например копия для
+        # manage.py check_query_plans.
+        "NAME": os.getenv(
+            "YATUBE_DB_PATH", os.path.join(BASE_DIR, "db.sqlite3"),
+        ),
+        # Соединение переживает запрос: PRAGMA и открытие файла — один
+        # раз на поток, а не на каждый запрос.
+        "CONN_MAX_AGE": int(os.getenv("YATUBE_DB_CONN_MAX_AGE", 600)),
+        "OPTIONS": {
+            "pragmas": SQLITE_PRAGMAS,
+            "transaction_mode": "IMMEDIATE",
+        },
     }
 }
 
+# Реплики только для чтения: YATUBE_DB_REPLICAS — пути к копиям базы
+# через запятую, их обновляет manage.py sync_replicas. Кто записал,
+# DATABASE_REPLICA_PIN_SECONDS читает из основной базы; окно должно
+# быть больше интервала синхронизации (см. core/db/routers.py).
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.getenv("YATUBE_DB_REPLICAS", "").split(",")), 1,
+):
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "NAME": path.strip(),
+        "OPTIONS": {"pragmas": {**SQLITE_PRAGMAS, "query_only": 1}},
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["core.db.routers.PrimaryReplicaRouter"]
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv("YATUBE_DB_PIN_SECONDS", 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -111,11 +158,48 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
-CACHES = {
-    'default': {
+# Кеш общий для всех воркеров: счётчики, поколения лент и страницы
+# должны инвалидироваться сразу во всех процессах.
+# YATUBE_CACHE=sqlite — файл на локальном диске (один сервер),
+# YATUBE_CACHE=redis — сервер с протоколом Redis, адрес в
+# YATUBE_CACHE_LOCATION (redis://host:port/db),
+# YATUBE_CACHE=locmem — память процесса, только для одного воркера.
+# Файл sqlite по умолчанию лежит в каталоге кеша пользователя,
+# а не среди исходников. Его (как и сервер Redis) могут делить
+# несколько баз на машине, поэтому у ключей префикс основной базы;
+# YATUBE_CACHE_KEY_PREFIX задаёт его явно.
+YATUBE_CACHE = os.getenv('YATUBE_CACHE', 'sqlite')
+CACHE_DIR = os.getenv('XDG_CACHE_HOME') or os.path.join(
+    os.path.expanduser('~'), '.cache',
+)
+CACHE_BACKENDS = {
+    'sqlite': {
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'yatube', 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'redis': {
+        'BACKEND': 'core.cache_backends.resp.RespCache',
+        'LOCATION': 'redis://127.0.0.1:6379/0',
+    },
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+}
+CACHES = {
+    'default': dict(CACHE_BACKENDS[YATUBE_CACHE]),
 }
+if os.getenv('YATUBE_CACHE_LOCATION'):
+    CACHES['default']['LOCATION'] = os.getenv('YATUBE_CACHE_LOCATION')
+CACHES['default']['KEY_PREFIX'] = os.getenv('YATUBE_CACHE_KEY_PREFIX') or (
+    'yatube-' + hashlib.md5(
+        os.path.abspath(DATABASES['default']['NAME']).encode(),
+    ).hexdigest()[:8]
+)
+
+# Тесты идут со своим кешем и без фоновых задач: core/test_runner.py
+# (manage.py test) и conftest.py в корне (pytest).
+TEST_RUNNER = 'core.test_runner.TestRunner'
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -135,10 +219,20 @@ USE_TZ = True
 
 STATIC_URL = "/static/"
 STATICFILES_DIRS = (os.path.join(BASE_DIR, "static"),)
+STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
+# collectstatic добавляет хеш содержимого в имена и пишет копии
+# .gz/.br; без nginx их отдаёт core.wsgi.StaticFilesApplication.
+STATICFILES_STORAGE = "core.staticfiles.CompressedManifestStaticFilesStorage"
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки пишутся на диск кусками, без EXIF и с лимитами
+# (posts/uploads.py); лимиты проверяются до декодирования картинки.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.StreamingImageUploadHandler']
+POSTS_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+POSTS_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
 
 LOGIN_URL = "users:login"
@@ -149,3 +243,56 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Страницы лент живут в кеше долго: любая запись в области
+# (вся лента, группа, автор) меняет поколение и ключ страницы.
+POSTS_PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# Карточка поста кешируется по (id, версия) и не требует сброса:
+# изменение поста, его автора или группы увеличивает версию.
+POSTS_CARD_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Доля запросов, для которых считаются SQL, шаблоны и кеш
+# (заголовок Server-Timing и лог yatube.metrics).
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv('REQUEST_METRICS_SAMPLE_RATE', '0.01')
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Миниатюры создаются в фоне (posts/thumbnails.py), пока их нет —
+# в шаблоне заглушка. Пул: "thread", "process" или "sync".
+# Варианты картинки поста: ширины для srcset с пропорциями
+# POSTS_IMAGE_ASPECT; больше исходника картинка не увеличивается,
+# кроме базовой ширины.
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+POSTS_IMAGE_WIDTHS = (480, 960, 1440)
+POSTS_IMAGE_BASE_WIDTH = 960
+POSTS_IMAGE_ASPECT = (960, 339)
+POSTS_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+POSTS_THUMBNAIL_EXECUTOR = os.getenv('POSTS_THUMBNAIL_EXECUTOR', 'thread')
+POSTS_THUMBNAIL_WORKERS = 2
+
+# Лента подписок: "timeline" — материализованная при записи,
+# "merge" — слияние кешированных списков постов авторов при чтении,
+# "sql" — JOIN подписок и постов на каждый запрос.
+# После смены движка выполните rebuild_timelines и очистите кеш.
+POSTS_FOLLOW_FEED_ENGINE = 'timeline'
+# Длина кешированного списка последних постов автора для "merge".
+POSTS_RECENT_POSTS_LIMIT = 200
+# При большем числе подписок "merge" уступает место SQL.
+POSTS_MERGE_MAX_AUTHORS = 500